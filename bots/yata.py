@@ -38,26 +38,83 @@ from discord import Embed
 from inc.yata_db import set_configuration
 from inc.yata_db import delete_configuration
 from inc.yata_db import get_yata_user
+from inc.yata_db import get_identities
+from inc.yata_db import set_identity
+from inc.yata_db import delete_identity
 from inc.handy import *
+from inc.scheduler import DeadlineScheduler
+from inc.ratelimit import KeyRateLimiter
+from inc.territory import TerritoryPoller
+from inc.members import MemberIndex
 
 
 # Child class of Bot with extra configuration variables
 class YataBot(Bot):
-    def __init__(self, configurations=None, main_server_id=0, bot_id=0, master_key="", github_token=None, **args):
+    def __init__(self, configurations=None, main_server_id=0, bot_id=0, master_key="", github_token=None, stocks_snapshot_ttl=60, identity_max_age=30 * 24 * 3600, **args):
         Bot.__init__(self, **args)
         self.configurations = configurations
         self.bot_id = int(bot_id)
         self.master_key = master_key
+        self.stocks_snapshot_ttl = int(stocks_snapshot_ttl)
         self.github_token = github_token
         self.main_server_id = int(main_server_id)
 
+        # discord id: (torn id, timestamp of the last confirmation by torn)
+        # loaded from the database on first use and confirmed again after identity_max_age seconds
+        self.identities = None
+        self.identity_max_age = int(identity_max_age)
+
+        # shared deadline scheduler for cogs timers
+        self.scheduler = DeadlineScheduler()
+
+        # torn API calls per key (torn limit is 100 per minute)
+        self.key_limiter = KeyRateLimiter(calls=90, period=60)
+
+        # rackets, territory wars and raids snapshots shared by the cogs
+        self.territory = TerritoryPoller(self)
+
+        # role -> members index per guild maintained by the member events
+        self.members_index = MemberIndex()
+
+    async def _load_identities(self):
+        if self.identities is None:
+            self.identities = {r["discord_id"]: (r["torn_id"], r["confirmed"]) for r in await get_identities()}
+            logging.debug(f"[identities] {len(self.identities)} identities loaded")
+
+    async def get_identity(self, discord_id):
+        """ get the torn id of a discord id from the identity cache
+            return None if unknown or not confirmed for more than identity_max_age
+        """
+        await self._load_identities()
+        identity = self.identities.get(int(discord_id))
+        if identity is None or ts_now() - identity[1] > self.identity_max_age:
+            return None
+        return identity[0]
+
+    async def confirm_identity(self, discord_id, torn_id):
+        """ stores an identity confirmed by torn (torn_id=None to forget it)
+        """
+        await self._load_identities()
+        discord_id = int(discord_id)
+        if torn_id is None:
+            if self.identities.pop(discord_id, None) is not None:
+                await delete_identity(discord_id)
+        else:
+            self.identities[discord_id] = (int(torn_id), ts_now())
+            await set_identity(discord_id, int(torn_id), ts_now())
+
     async def discord_to_torn(self, member, key):
         """ get a torn id form discord id
             return tornId, None: okay
             return -1, error: api error
             return -2, None: not verified on discord
         """
+        tornId = await self.get_identity(member.id)
+        if tornId is not None:
+            return tornId, None
+
         url = f"https://api.torn.com/user/{member.id}?selections=discord&key={key}"
+        await self.key_limiter.acquire(key)
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as r:
                 req = await r.json()
@@ -68,10 +125,13 @@ class YataBot(Bot):
 
         elif req['discord'].get("userID") == '':
             # logging.info(f'[DISCORD TO TORN] discord id {member.id} not verified')
+            await self.confirm_identity(member.id, None)
             return -2, None
 
         else:
-            return int(req['discord'].get("userID")), None
+            tornId = int(req['discord'].get("userID"))
+            await self.confirm_identity(member.id, tornId)
+            return tornId, None
 
     async def get_master_key(self, guild):
         """ gets a random master key from configuration
@@ -98,6 +158,22 @@ class YataBot(Bot):
             logging.warning(f"[get_master_key] {guild}: no master keys ids found")
             return -1, None, None
 
+    async def get_master_keys(self, guild):
+        """ gets the keys of all the server admins from configuration (to spread bulk API calls)
+            return [] if no key found
+        """
+        c = self.configurations.get(guild.id)
+        if c is None:
+            return []
+
+        keys = []
+        for v in c.get("admin", {}).get("server_admins", {}).values():
+            user = await get_yata_user(v["torn_id"], type="T")
+            if len(user):
+                keys.append(tuple(user[0])[2])
+        logging.info(f"[get_master_keys] {guild}: {len(keys)} keys")
+        return keys
+
     async def get_user_key(self, ctx, member, needPerm=True, returnMaster=False, delError=False, guild=False):
         """ gets a key from discord member
             return status, tornId, Name, key
@@ -121,10 +197,10 @@ class YataBot(Bot):
 
         # get master key to check identity
 
-        logging.debug(f"[GET USER KEY] <{ctx.guild}> get master key")
-        master_status, master_id, master_key = await self.get_master_key(ctx.guild)
+        logging.debug(f"[GET USER KEY] <{guild}> get master key")
+        master_status, master_id, master_key = await self.get_master_key(guild)
         if master_status == -1:
-            logging.debug(f"[GET USER KEY] <{ctx.guild}> no master key given")
+            logging.debug(f"[GET USER KEY] <{guild}> no master key given")
             if ctx:
                 m = await self.send_error_message(ctx, f'No master key given.', title="Error getting user API key")
                 if delError:
@@ -387,8 +463,22 @@ class YataBot(Bot):
 
         if guild.id in self.configurations:
             self.configurations.pop(guild.id)
+
+        self.members_index.remove_guild(guild)
         await delete_configuration(self.bot_id, guild.id)
 
+    async def on_member_join(self, member):
+        self.members_index.add_member(member)
+
+    async def on_member_remove(self, member):
+        self.members_index.remove_member(member)
+
+    async def on_member_update(self, before, after):
+        self.members_index.update_member(before, after)
+
+    async def on_guild_role_delete(self, role):
+        self.members_index.remove_role(role)
+
     async def send_error_message(self, channel, description, fields={}, title=False, delete=False):
         title = title if title else "Error"
         eb = Embed(title=title, description=description, color=my_red)
@@ -409,6 +499,7 @@ class YataBot(Bot):
         # url = f'https://{"torn-proxy.com" if proxy else "api.torn.com"}/{section}/{id}?selections={",".join(selections)}&key={key}'
         proxy = False
         url = f'https://api.torn.com/{section}/{id}?selections={",".join(selections)}&key={key}&comment={comment}'
+        await self.key_limiter.acquire(key)
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as r:
                 try:
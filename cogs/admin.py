@@ -183,6 +183,7 @@ class Admin(commands.Cog):
         await set_configuration(self.bot_id, ctx.guild.id, ctx.guild.name, configuration)
 
         self.bot.configurations[ctx.guild.id] = configuration
+        self.bot.dispatch("configuration_update", ctx.guild)
 
         if not len(updates):
             updates.append("None")
@@ -252,6 +253,21 @@ class Admin(commands.Cog):
         await self.bot.send_error_message(ctx, f'Server or member id `{args[0]}` not found in the configuration')
 
 
+    @commands.command()
+    @commands.has_any_role(679669933680230430, 669682126203125760)
+    async def timers(self, ctx, *args):
+        """Admin tool for the bot owner: list the pending timers of the scheduler"""
+        logging.info(f'[admin/timers] {ctx.guild}: {ctx.author.nick} / {ctx.author}')
+
+        prefix = tuple(args[:1])
+        pending = self.bot.scheduler.pending(prefix)
+        lst = [f'`{" ".join([str(_) for _ in key])}` in {s_to_time(ts - ts_now())} at {ts_format(ts, fmt="short")}' for ts, key in pending[:25]]
+        if len(pending) > 25:
+            lst.append(f'... and {len(pending) - 25} more')
+
+        eb = Embed(title=f'{len(pending)} pending timer{"s" if len(pending) > 1 else ""}', description="\n".join(lst) if len(lst) else "None", color=my_blue)
+        await send(ctx, embed=eb)
+
     @commands.command()
     @commands.has_any_role(669682126203125760)
     async def talk(self, ctx, *args):
@@ -219,15 +219,19 @@ class API(commands.Cog):
                 if status < 0:
                     await self.bot.send_error_message(ctx.channel, "Author key not found to make the API call")
                     return
-                r, e = await self.bot.api_call("user", int(args[0]), ["discord"], key, error_channel=ctx.channel)
-                if e or 'discord' not in r:
-                    return
-                tornId = r.get('discord', {}).get('userID', 0)
-                if str(tornId).isdigit():
-                    tornId = int(tornId)
-                else:
-                    await self.bot.send_error_message(ctx.channel, f"Discord ID `{args[0]}` not verified")
-                    return
+                tornId = await self.bot.get_identity(int(args[0]))
+                if tornId is None:
+                    r, e = await self.bot.api_call("user", int(args[0]), ["discord"], key, error_channel=ctx.channel)
+                    if e or 'discord' not in r:
+                        return
+                    tornId = r.get('discord', {}).get('userID', 0)
+                    if str(tornId).isdigit():
+                        tornId = int(tornId)
+                        await self.bot.confirm_identity(int(args[0]), tornId)
+                    else:
+                        await self.bot.confirm_identity(int(args[0]), None)
+                        await self.bot.send_error_message(ctx.channel, f"Discord ID `{args[0]}` not verified")
+                        return
 
         # check if arg is a mention of a discord user ID
         elif re.match(r'<@!?\d+>', args[0]):
@@ -246,10 +250,8 @@ class API(commands.Cog):
                 return
 
             # try to parse Torn user ID
-            regex = re.findall(r'\[(\d{1,7})\]', member.display_name)
-            if len(regex) == 1 and regex[0].isdigit():
-                tornId = int(regex[0])
-            else:
+            tornId = self.bot.members_index.torn_id(member)
+            if tornId is None:
                 status, tornId, _, _ = await self.bot.get_user_key(ctx, member, needPerm=False)
                 if status in [-1, -2, -3]:
                     await self.bot.send_error_message(ctx.channel, "Could not find Torn ID within their display name and verification failed.\nTry `!who < Torn ID >`.")
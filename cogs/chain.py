@@ -496,7 +496,7 @@ class Chain(commands.Cog):
             member = ctx.guild.get_member(int(discordID[0]))
             checkVaultId, err = await self.bot.discord_to_torn(member, key)
             if checkVaultId == -1:
-                await self.bot.send_error_message(ctx, f'Error code {r["error"]["code"]}: {r["error"]["error"]}')
+                await self.bot.send_error_message(ctx, f'Error code {err["code"]}: {err["error"]}')
                 return
             elif checkVaultId == -2:
                 await self.bot.send_error_message(ctx, f'Discord member {discordID[0]} is not verified')
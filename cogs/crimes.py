@@ -27,6 +27,7 @@ import re
 import traceback
 import logging
 import html
+import time
 
 # import discord modules
 from discord.ext import commands
@@ -38,16 +39,233 @@ from discord import Embed
 from inc.yata_db import set_configuration
 from inc.handy import *
 
+# recheck cadence while a ready crime is waiting on its participants
+OC_RECHECK = 300
+# longest sleep when nothing is due (has to stay below the shortest crime duration)
+OC_IDLE = 6 * 3600
+
+
+class OCRenderer:
+    """ base class of the OC tracking renderers (shared run and metrics)
+        subclasses define render() which gets a tracking with the crimes of its faction
+        already classified and updates the mentions of the tracking
+    """
+    name = None
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.metrics = {"trackings": 0, "messages": 0, "edits": 0, "seconds": 0.0}
+
+    async def run(self, tracking, faction):
+        start = time.perf_counter()
+        try:
+            await self.render(tracking, faction)
+        finally:
+            self.metrics["trackings"] += 1
+            self.metrics["seconds"] += time.perf_counter() - start
+
+
+class OCMessageRenderer(OCRenderer):
+    """ legacy renderer: one message per crime ready, not ready anymore or completed
+    """
+    name = "legacy"
+
+    async def render(self, tracking, faction):
+        oc = tracking["oc"]
+        channel = tracking["channel"]
+
+        roleId = oc.get("role")[0] if len(oc.get("role", {})) else None
+        notified = "OC" if roleId is None else f"<@&{roleId}>"
+
+        # init mentions if empty
+        if "mentions" not in oc:
+            oc["mentions"] = []
+
+        # loop over crimes
+        for k, v in faction["crimes"].items():
+
+            # is already mentionned
+            mentionned = k in oc["mentions"]
+
+            # exit if not ready
+            if not v["due"]:
+                continue
+
+            # if completed and already mentionned -> remove the already mentionned
+            if v["completed"] and mentionned:
+                initId = str(v["initiated_by"])
+                fields = {
+                    "Faction": f'{faction["name"]}',
+                    "Crime": f'{v["crime_name"]}',
+                    "Initiated": f'{faction["members"].get(initId, {"name": "Player"})["name"]} [{v["initiated_by"]}].',
+                    "Money": f'${v["money_gain"]:,}',
+                    "Respect": f'{v["respect_gain"]:,}'}
+                eb = Embed(title=f'{v["crime_name"]} completed', color=my_blue)
+                for name, value in fields.items():
+                    eb.add_field(name=name, value=value)
+                await send(channel, embed=eb)
+                self.metrics["messages"] += 1
+                oc["mentions"].remove(k)
+
+            # exit if completed
+            if v["completed"]:
+                continue
+
+            # if ready and not already mentionned -> mention
+            if v["ready"] and not mentionned:
+                eb = Embed(title=f'OC ready', description=f'[{v["crime_name"]}](https://www.torn.com/factions.php?step=your#/tab=crimes)', color=my_green)
+                eb.add_field(name="Crime ID", value=f'{k}')
+                eb.add_field(name="Faction", value=f'{faction["name"]}')
+                await send(channel, f'{notified} {v["crime_name"]}', embed=eb)
+                self.metrics["messages"] += 1
+                oc["mentions"].append(k)
+
+            # if not ready (because of participants) and already mentionned -> remove the already mentionned
+            if not v["ready"] and mentionned:
+                eb = Embed(title=f'OC not ready anymore', description=v["crime_name"], color=my_red)
+                eb.add_field(name="Crime ID", value=f'{k}')
+                eb.add_field(name="Faction", value=f'{faction["name"]}')
+                await send(channel, embed=eb)
+                self.metrics["messages"] += 1
+                oc["mentions"].remove(k)
+
+        # clean mentions
+        oc["mentions"] = [k for k in oc["mentions"] if k in faction["crimes"]]
+
+
+class OCEditRenderer(OCRenderer):
+    """ v2 renderer: one summary message per faction edited in place
+        (deleted and sent again when a new mention is needed)
+    """
+    name = "v2"
+
+    async def render(self, tracking, faction):
+        oc = tracking["oc"]
+        channel = tracking["channel"]
+        notifications = tracking["notifications"]
+
+        roleId = oc.get("role")[0] if len(oc.get("role", {})) else None
+        notified = "OC" if roleId is None else f"<@&{roleId}>"
+
+        # init mentions if empty
+        if "mentions" not in oc:
+            oc["mentions"] = []
+
+        # loop over crimes
+        crimes_fields = {"ready": [], "completed": [], "not_ready": [], "waiting": []}
+        need_to_mention = False
+        need_to_display = []
+        for k, v in faction["crimes"].items():
+            # is already mentionned
+            mentionned = k in oc["mentions"]
+
+            # exit if not ready
+            if not v["due"]:
+                continue
+
+            # if completed and already mentionned -> remove the already mentionned
+            if v["completed"] and mentionned:
+                crimes_fields["completed"].append(f'{v["crime_name"]} `{k}`')
+                oc["mentions"].remove(k)
+
+            # exit if completed
+            if v["completed"]:
+                continue
+
+            # if ready and not already mentionned -> mention
+            if v["ready"]:
+                crimes_fields["ready"].append([k, v["crime_name"]])
+                need_to_display.append(v["crime_name"])
+                if not mentionned and v["crime_id"] in notifications:
+                    need_to_mention = True
+                    oc["mentions"].append(k)
+
+            # if not ready (because of participants) and already mentionned -> remove the already mentionned
+            if not v["ready"] and mentionned:
+                crimes_fields["not_ready"].append(f'{v["crime_name"]} {v["n_p_rea"]}/{v["n_p_tot"]} `{k}`')
+                oc["mentions"].remove(k)
+
+            if not v["ready"] and not mentionned:
+                crimes_fields["waiting"].append(f'- {v["crime_name"]} {v["n_p_rea"]}/{v["n_p_tot"]} `{k}`')
+
+        # clean mentions
+        oc["mentions"] = [k for k in oc["mentions"] if k in faction["crimes"]]
+
+        # create the message
+        notified = notified if need_to_mention else "OC"
+        if not len(need_to_display):
+            content = f'{notified} no crimes ready'
+        elif len(need_to_display) == 1:
+            content = f'{notified} {need_to_display[0]} ready'
+        else:
+            content = f'{notified} {len(need_to_display)} crimes ready'
+
+        title = f"{faction['name']}'s Organized Crimes"
+        embed = Embed(title=title, color=my_blue)
+        if len(crimes_fields["ready"]):
+            list_of_crimes = []
+            for k, v in crimes_fields["ready"]:
+                list_of_crimes.append(f':white_check_mark: [{v}](https://www.torn.com/factions.php?step=your#/tab=crimes) `{k}`')
+                if len("\n".join(list_of_crimes)) > 1000:
+                    list_of_crimes[-1] = '...'
+                    break
+            embed.add_field(name="Ready", value="\n".join(list_of_crimes))
+        else:
+            embed.add_field(name="Ready", value="None")
+
+        for key, name in [("waiting", "Waiting"), ("not_ready", "Not Ready anymore"), ("completed", "Just Completed")]:
+            if len(crimes_fields[key]):
+                list_of_crimes = []
+                for v in crimes_fields[key]:
+                    list_of_crimes.append(v)
+                    if len("\n".join(list_of_crimes)) > 1000:
+                        list_of_crimes[-1] = '...'
+                        break
+                embed.add_field(name=name, value="\n".join(list_of_crimes))
+
+        embed.set_footer(text=f'Last update: {ts_format(faction["timestamp"], fmt="short")}')
+        embed.timestamp = datetime.datetime.fromtimestamp(faction["timestamp"], tz=pytz.UTC)
+
+        # lookup in the last 2 messages to update instead of creating a new one
+        # or delete if need a new mention
+        async for message in channel.history(limit=2):
+            if message.author.bot and len(message.embeds):
+                # check title of embed to get the message
+                if message.embeds[0].to_dict().get('title') != title:
+                    continue
+
+                # delete and create new message if need to mention
+                if need_to_mention:
+                    await message.delete()
+                    await send(channel, content, embed=embed)
+                    self.metrics["messages"] += 1
+                    return
+
+                # compare embed to see if needs to update or not
+                if not message.embeds[0].to_dict().get('fields') == embed.to_dict().get('fields'):
+                    await message.edit(content=content, embed=embed)
+                    self.metrics["edits"] += 1
+
+                return
+
+        # if no message found send a new one
+        await send(channel, content, embed=embed)
+        self.metrics["messages"] += 1
+
 
 class Crimes(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # next timestamp each tracking has to be polled at and faction id of the tracking
+        # key: (guild id, discord user id)
+        self.oc_next = {}
+        self.oc_factions = {}
+        # renderers (v2 for beta servers)
+        self.renderers = {r.name: r for r in [OCMessageRenderer(bot), OCEditRenderer(bot)]}
         self.ocTask.start()
-        self.ocTask_v2.start()
 
     def cog_unload(self):
         self.ocTask.cancel()
-        self.ocTask_v2.cancel()
 
     @commands.command()
     @commands.bot_has_permissions(send_messages=True)
@@ -79,6 +297,7 @@ class Crimes(commands.Cog):
 
         crimes = response["crimes"]
         members = response["members"]
+        ebs = []
         for k, v in crimes.items():
             ready = not v["time_left"] and not v["time_completed"]
             if ready:
@@ -92,8 +311,10 @@ class Crimes(commands.Cog):
                     status = list(p.values())[0]
                     participants.append(f'- {name}: {status["state"]} ({status["description"]})')
                 eb.add_field(name=f'{len(v["participants"])} participants', value="\n".join(participants))
+                ebs.append(eb)
 
-                await send(ctx, embed=eb)
+        if len(ebs):
+            await send(ctx, embeds=ebs)
 
     @commands.command()
     @commands.bot_has_permissions(send_messages=True)
@@ -126,6 +347,8 @@ class Crimes(commands.Cog):
                 eb.add_field(name=k.replace("_", " ").title(), value=f'{v[2]}{v[1]} [{v[0]}]')
             await send(ctx.channel, embed=eb)
             del self.bot.configurations[ctx.guild.id]["oc"]["currents"][str(ctx.author.id)]
+            self.oc_next.pop((ctx.guild.id, str(ctx.author.id)), None)
+            self.oc_factions.pop((ctx.guild.id, str(ctx.author.id)), None)
             await set_configuration(self.bot.bot_id, ctx.guild.id, ctx.guild.name, self.bot.configurations[ctx.guild.id])
             return
 
@@ -153,445 +376,148 @@ class Crimes(commands.Cog):
             eb.add_field(name=k.replace("_", " ").title(), value=f'{v[2]}{v[1]} [{v[0]}]')
         await send(ctx.channel, embed=eb)
         self.bot.configurations[ctx.guild.id]["oc"]["currents"][str(ctx.author.id)] = current
+        self.oc_next.pop((ctx.guild.id, str(ctx.author.id)), None)
+        self.oc_factions.pop((ctx.guild.id, str(ctx.author.id)), None)
         await set_configuration(self.bot.bot_id, ctx.guild.id, ctx.guild.name, self.bot.configurations[ctx.guild.id])
 
-    async def _oc(self, guild, oc):
-
-        # get channel
-        channelId = oc.get("channel")[0] if len(oc.get("channel", {})) else None
-        channel = get(guild.channels, id=int(channelId))
-        if channel is None:
-            return False
-
-        # get discord member
-        discord_id = oc.get("discord_user")[0] if len(oc.get("discord_user", {})) else "0"
-        discord_member = get(guild.members, id=int(discord_id))
-        if discord_member is None:
-            await self.bot.send_error_message(channel, f'Discord member #{discord_id} not found\n\nSTOP', title="Error tracking organized crimes")
-            return False
-
-        # get torn id, name and key
-        # status, tornId, name, key = await self.bot.get_user_key(False, discord_member, guild=guild)
-        #
-        # if status < 0:
-        #     await send(channel, f'```md\n# Tracking organized crimes\n< error > could not find torn identity of discord member {discord_member}```')
-        #     return False
-
-        if len(oc.get("torn_user")) < 4:
-            await self.bot.send_error_message(channel, f'Sorry it\'s my bad. I had to change how the tracking is built. You can launch it again now.\nKivou\n\nSTOP', title="Error tracking organized crimes")
-            return False
-
-        tornId = oc.get("torn_user")[0]
-        name = oc.get("torn_user")[1]
-        key = oc.get("torn_user")[3]
-
-        roleId = oc.get("role")[0] if len(oc.get("role", {})) else None
-        notified = "OC" if roleId is None else f"<@&{roleId}>"
-
-        response, e = await self.bot.api_call("faction", "", ["basic", "crimes"], key)
-        if e and 'error' in response:
-
-            lst = [f'Error code {response["error"]["code"]} with {name} [{tornId}]\'s key: {response["error"]["error"]}']
-            if response["error"]["code"] in [7]:
-                lst.append("It means that you don't have the required AA permission (AA for API access) for this API request")
-                lst.append("This is an in-game permission that faction leader and co-leader can grant to their members")
-
-            if response["error"]["code"] in [1, 2, 6, 7, 10]:
-                lst += ["", "STOP"]
-                await self.bot.send_error_message(channel, "\n".join(lst), title="OC tracking API key error")
-                return False
-            else:
-                lst += ["", "CONTINUE"]
-                await self.bot.send_error_message(channel, "\n".join(lst), title="Error tracking organized crimes")
-                return True
-
-        if response is None or "ID" not in response:
-            await self.bot.send_error_message(channel, f'API is talking shit... #blameched\n\nCONTINUE', title="Error tracking organized crimes")
-            return True
-
-        if not int(response["ID"]):
-            await self.bot.send_error_message(channel, f'No faction found for {name} [{tornId}]\n\nSTOP', title="Error tracking organized crimes")
-            return False
-
-        # faction id and name
-        fId = response["ID"]
-        fName = response["name"]
-
-        # faction members
-        members = response["members"]
-
-        # get timestamps
-        now = datetime.datetime.utcnow()
-        epoch = datetime.datetime(1970, 1, 1, 0, 0, 0)
-        nowts = (now - epoch).total_seconds()
-
-        # init mentions if empty
-        if "mentions" not in oc:
-            oc["mentions"] = []
 
-        # loop over crimes
+    def _oc_diff(self, response):
+        """ classifies the crimes of a faction once for all its trackings
+            - due: time left is 0 (ready without looking at the participants)
+            - completed: crime has been done
+            - ready: due, not completed and all participants okay
+        """
+        crimes = {}
         for k, v in response["crimes"].items():
-
-            # is already mentionned
-            mentionned = True if str(k) in oc["mentions"] else False
-
-            # is ready (without members)
-            ready = v["time_left"] == 0
-
-            # is completed
+            participants = [list(p.values())[0] for p in v["participants"] if p]
+            n_p_rea = len([p for p in participants if p["state"] == "Okay"])
+            due = v["time_left"] == 0
             completed = v["time_completed"] > 0
-
-            # exit if not ready
-            if not ready:
-                continue
-
-            # if completed and already mentionned -> remove the already mentionned
-            if completed and mentionned:
-                initId = str(v["initiated_by"])
-                fields = {
-                    "Faction": f'{fName}',
-                    "Crime": f'{v["crime_name"]}',
-                    "Initiated": f'{members.get(initId, {"name": "Player"})["name"]} [{v["initiated_by"]}].',
-                    "Money": f'${v["money_gain"]:,}',
-                    "Respect": f'{v["respect_gain"]:,}'}
-                eb = Embed(title=f'{v["crime_name"]} completed', color=my_blue)
-                for name, value in fields.items():
-                    eb.add_field(name=name, value=value)
-                await send(channel, embed=eb)
-                oc["mentions"].remove(str(k))
-
-            # exit if completed
-            if completed:
+            crimes[str(k)] = {
+                "crime_id": str(v["crime_id"]),
+                "crime_name": v["crime_name"],
+                "time_ready": v["time_ready"],
+                "due": due,
+                "completed": completed,
+                "ready": due and not completed and n_p_rea == len(participants),
+                "n_p_rea": n_p_rea,
+                "n_p_tot": len(participants),
+                "initiated_by": v["initiated_by"],
+                "money_gain": v["money_gain"],
+                "respect_gain": v["respect_gain"]}
+
+        return crimes
+
+    def _oc_next_ts(self, crimes, now):
+        """ computes the next instant a faction has to be polled
+            - a crime due but not completed (blocked or waiting to be done): recheck cadence
+            - otherwise the earliest time_ready of the crimes not due yet
+            - capped by the idle cadence to catch newly initiated crimes
+        """
+        next_ts = now + OC_IDLE
+        for v in crimes.values():
+            if v["completed"]:
                 continue
 
-            # change ready based on participants
-            participants = [list(p.values())[0] for p in v["participants"] if v is not None]
-            for p in participants:
-                if p["state"] != "Okay":
-                    ready = False
-
-            # if ready and not already mentionned -> mention
-            if ready and not mentionned:
-                eb = Embed(title=f'OC ready', description=f'[{v["crime_name"]}](https://www.torn.com/factions.php?step=your#/tab=crimes)', color=my_green)
-                eb.add_field(name="Crime ID", value=f'{k}')
-                eb.add_field(name="Faction", value=f'{fName}')
-                await send(channel, f'{notified} {v["crime_name"]}', embed=eb)
-                oc["mentions"].append(str(k))
-
-            # if not ready (because of participants) and already mentionned -> remove the already mentionned
-            if not ready and mentionned:
-                eb = Embed(title=f'OC not ready anymore', description=v["crime_name"], color=my_red)
-                eb.add_field(name="Crime ID", value=f'{k}')
-                eb.add_field(name="Faction", value=f'{fName}')
-                await send(channel, embed=eb)
-                oc["mentions"].remove(str(k))
-
-        # clean mentions
-        cleanedMentions = []
-        for k in oc["mentions"]:
-            if str(k) in response["crimes"]:
-                cleanedMentions.append(str(k))
-
-        oc["mentions"] = cleanedMentions
-
-        # delete old messages
-        # fminutes = now - datetime.timedelta(minutes=5)
-        # async for message in channel.history(limit=50, before=fminutes):
-        #     if message.author.bot:
-        #         await message.delete()
+            if v["due"] or v["time_ready"] <= now:
+                next_ts = min(next_ts, now + OC_RECHECK)
+            else:
+                next_ts = min(next_ts, v["time_ready"])
 
-        return True
+        return next_ts
 
-    async def _oc_v2(self, guild, oc, notifications):
+    async def _oc_tracking(self, guild, discord_user_id, oc):
+        """ checks that a tracking can run
+            return channel, None: okay
+            return None, reason: tracking has to be stopped
+        """
         # get channel
         channelId = oc.get("channel")[0] if len(oc.get("channel", {})) else None
         channel = get(guild.channels, id=int(channelId))
         if channel is None:
-            return False
+            return None, "channel not found"
 
         # get discord member
         discord_id = oc.get("discord_user")[0] if len(oc.get("discord_user", {})) else "0"
         discord_member = get(guild.members, id=int(discord_id))
         if discord_member is None:
             await self.bot.send_error_message(channel, f'Discord member #{discord_id} not found\n\nSTOP', title="Error tracking organized crimes")
-            return False
-
-        # get torn id, name and key
-        # status, tornId, name, key = await self.bot.get_user_key(False, discord_member, guild=guild)
-        #
-        # if status < 0:
-        #     await send(channel, f'```md\n# Tracking organized crimes\n< error > could not find torn identity of discord member {discord_member}```')
-        #     return False
+            return None, "member not found"
 
         if len(oc.get("torn_user")) < 4:
             await self.bot.send_error_message(channel, f'Sorry it\'s my bad. I had to change how the tracking is built. You can launch it again now.\nKivou\n\nSTOP', title="Error tracking organized crimes")
-            return False
-
-        tornId = oc.get("torn_user")[0]
-        name = oc.get("torn_user")[1]
-        key = oc.get("torn_user")[3]
-
-        roleId = oc.get("role")[0] if len(oc.get("role", {})) else None
-        notified = "OC" if roleId is None else f"<@&{roleId}>"
-
-        response, e = await self.bot.api_call("faction", "", ["basic", "crimes", "timestamp"], key)
-        if e and 'error' in response:
-
-            lst = [f'Problem with {name} [{tornId}]\'s key: {response["error"]["error"]}']
-            if response["error"]["code"] in [7]:
-                lst.append("It means that you don't have the required AA permission (AA for API access) for this API request")
-                lst.append("This is an in-game permission that faction leader and co-leader can grant to their members")
-
-            if response["error"]["code"] in [1, 2, 6, 7, 10]:
-                lst += ["", "STOP"]
-                await self.bot.send_error_message(channel, "\n".join(lst), title="Error tracking organized crimes")
-                return False
-            else:
-                lst += ["", "CONTINUE"]
-                await self.bot.send_error_message(channel, "\n".join(lst), title="Error tracking organized crimes")
-                return True
-
-        if response is None or "ID" not in response:
-            await self.bot.send_error_message(channel, f'API is talking shit... #blameched\n\nCONTINUE', title="Error tracking organized crimes")
-            return True
-
-        if not int(response["ID"]):
-            await self.bot.send_error_message(channel, f'No faction found for {name} [{tornId}]\n\nSTOP', title="Error tracking organized crimes")
-            return False
-
-        # faction id and name
-        fId = response["ID"]
-        fName = html.unescape(response["name"])
-
-        # faction members
-        members = response["members"]
-
-        # get timestamps
-        now = datetime.datetime.utcnow()
-        epoch = datetime.datetime(1970, 1, 1, 0, 0, 0)
-        nowts = (now - epoch).total_seconds()
+            return None, "old tracking format"
 
-        # init mentions if empty
-        if "mentions" not in oc:
-            oc["mentions"] = []
+        return channel, None
 
-        # loop over crimes
-        crimes_fields = {"ready": [], "completed": [], "not_ready": [], "waiting": []}
-        need_to_mention = False
-        need_to_display = []
-        for k, v in response["crimes"].items():
-            # is already mentionned
-            mentionned = True if str(k) in oc["mentions"] else False
-
-            # is ready (without members)
-            ready = v["time_left"] == 0
-
-            # is completed
-            completed = v["time_completed"] > 0
-
-
-            # exit if not ready
-            if not ready:
+    async def _oc_fetch(self, trackings):
+        """ makes one API call for a group of trackings of the same faction
+            tries the keys of the trackings one after the other until one works
+            return response, stop, tracking: stop is the set of trackings to delete
+            and tracking the one whose key has been used
+        """
+        stop = set()
+        for t in trackings:
+            tornId, name, _, key = t["oc"]["torn_user"][:4]
+            response, e = await self.bot.api_call("faction", "", ["basic", "crimes", "timestamp"], key)
+
+            if e and 'error' in response:
+                lst = [f'Error code {response["error"]["code"]} with {name} [{tornId}]\'s key: {response["error"]["error"]}']
+                if response["error"]["code"] in [7]:
+                    lst.append("It means that you don't have the required AA permission (AA for API access) for this API request")
+                    lst.append("This is an in-game permission that faction leader and co-leader can grant to their members")
+
+                if response["error"]["code"] in [1, 2, 6, 7, 10]:
+                    lst += ["", "STOP"]
+                    await self.bot.send_error_message(t["channel"], "\n".join(lst), title="OC tracking API key error")
+                    stop.add(t["key"])
+                else:
+                    lst += ["", "CONTINUE"]
+                    await self.bot.send_error_message(t["channel"], "\n".join(lst), title="Error tracking organized crimes")
                 continue
 
-            # if completed and already mentionned -> remove the already mentionned
-            if completed and mentionned:
-                initId = str(v["initiated_by"])
-                # crimes_fields["completed"].append({
-                #     "ID": str(k),
-                #     "Crime": f'{v["crime_name"]}',
-                #     "Initiated": f'{members.get(initId, {"name": "Player"})["name"]} [{v["initiated_by"]}].',
-                #     "Money": f'${v["money_gain"]:,}',
-                #     "Respect": f'{v["respect_gain"]:,}'})
-                crimes_fields["completed"].append(f'{v["crime_name"]} `{str(k)}`')
-                oc["mentions"].remove(str(k))
-
-            # exit if completed
-            if completed:
+            if response is None or "ID" not in response:
+                await self.bot.send_error_message(t["channel"], f'API is talking shit... #blameched\n\nCONTINUE', title="Error tracking organized crimes")
                 continue
 
-            # DEBUG: handy to comment this to have fake ready
-            # change ready based on participants
-            participants = [list(p.values())[0] for p in v["participants"] if v is not None]
-            n_p_tot = len(participants)
-            n_p_rea = 0
-            for p in participants:
-                if p["state"] != "Okay":
-                    ready = False
-                else:
-                    n_p_rea += 1
-
-            # DEBUG
-            # if k in ["8096922"]:
-            #     print("force ready")
-            #     ready = True
-            #     completed = False
-
-            # if ready and not already mentionned -> mention
-            if ready:
-                crimes_fields["ready"].append([str(k), v["crime_name"]])
-                need_to_display.append(v["crime_name"])
-                if not mentionned and str(v["crime_id"]) in notifications:
-                    need_to_mention = True
-                    oc["mentions"].append(str(k))
-
-            # if not ready (because of participants) and already mentionned -> remove the already mentionned
-            if not ready and mentionned:
-                crimes_fields["not_ready"].append(f'{v["crime_name"]} {n_p_rea}/{n_p_tot} `{str(k)}`')
-                oc["mentions"].remove(str(k))
-
-            if not ready and not mentionned:
-                crimes_fields["waiting"].append(f'- {v["crime_name"]} {n_p_rea}/{n_p_tot} `{str(k)}`')
-
-        # clean mentions
-        cleanedMentions = []
-        for k in oc["mentions"]:
-            if str(k) in response["crimes"]:
-                cleanedMentions.append(str(k))
-
-        oc["mentions"] = cleanedMentions
-
-        # delete old messages
-        # fminutes = now - datetime.timedelta(minutes=5)
-        # async for message in channel.history(limit=50, before=fminutes):
-        #     if message.author.bot:
-        #         await message.delete()
-
-        # create the message
-        notified = notified if need_to_mention else "OC"
-        if not len(need_to_display):
-            content = f'{notified} no crimes ready'
-        elif len(need_to_display) == 1:
-            content = f'{notified} {need_to_display[0]} ready'
-        else:
-            content = f'{notified} {len(need_to_display)} crimes ready'
-
-        title = f"{fName}'s Organized Crimes"
-        embed = Embed(title=title, color=my_blue)
-        if len(crimes_fields["ready"]):
-            list_of_crimes = []
-            for k, v in crimes_fields["ready"]:
-                list_of_crimes.append(f':white_check_mark: [{v}](https://www.torn.com/factions.php?step=your#/tab=crimes) `{k}`')
-                if len("\n".join(list_of_crimes)) > 1000:
-                    list_of_crimes[-1] = '...'
-                    break
-            embed.add_field(name="Ready", value="\n".join(list_of_crimes))
-        else:
-            embed.add_field(name="Ready", value="None")
-
-        if len(crimes_fields["waiting"]):
-            list_of_crimes = []
-            for v in crimes_fields["waiting"]:
-                list_of_crimes.append(v)
-                if len("\n".join(list_of_crimes)) > 1000:
-                    list_of_crimes[-1] = '...'
-                    break
-            embed.add_field(name="Waiting", value="\n".join(list_of_crimes))
-
-        if len(crimes_fields["not_ready"]):
-            list_of_crimes = []
-            for v in crimes_fields["not_ready"]:
-                list_of_crimes.append(v)
-                if len("\n".join(list_of_crimes)) > 1000:
-                    list_of_crimes[-1] = '...'
-                    break
-            embed.add_field(name="Not Ready anymore", value="\n".join(list_of_crimes))
-
-        if len(crimes_fields["completed"]):
-            list_of_crimes = []
-            for v in crimes_fields["completed"]:
-                list_of_crimes.append(v)
-                if len("\n".join(list_of_crimes)) > 1000:
-                    list_of_crimes[-1] = '...'
-                    break
-            embed.add_field(name="Just Completed", value="\n".join(list_of_crimes))
-
-        embed.set_footer(text=f'Last update: {ts_format(response["timestamp"], fmt="short")}')
-        embed.timestamp = datetime.datetime.fromtimestamp(response["timestamp"], tz=pytz.UTC)
-
-        # lookup in the last 10 messages to update instead of creating a new one
-        # or delete if need a new mention
-        async for message in channel.history(limit=2):
-            if message.author.bot and len(message.embeds):
-                # check title of embed to get the message
-                eb1 = message.embeds[0].to_dict()
-                if eb1.get('title') != title:
-                    # print("pass, not good message")
-                    continue
-
-                # print("found message to update")
-
-                # delete and create new message if need to mention
-                if need_to_mention:
-                    # print("delete message because need new mention")
-                    await message.delete()
-                    await send(channel, content, embed=embed)
-                    return True
-
-                # compare embed to see if needs to update or not
-                if not message.embeds[0].to_dict().get('fields') == embed.to_dict().get('fields'):
-                    # print("update message")
-                    await message.edit(content=content, embed=embed)
+            if not int(response["ID"]):
+                await self.bot.send_error_message(t["channel"], f'No faction found for {name} [{tornId}]\n\nSTOP', title="Error tracking organized crimes")
+                stop.add(t["key"])
+                continue
 
-                return True
+            return response, stop, t
 
-        # if no message found send a new one
-        # print("no message found")
-        await send(channel, content, embed=embed)
+        return None, stop, None
 
-        return True
-
-    @tasks.loop(seconds=300)
-    async def ocTask_v2(self):
+    @tasks.loop(seconds=60)
+    async def ocTask(self):
         logging.debug(f"[oc/notifications] start task")
 
-        # iteration over all guilds
+        # step 1: scan configurations once and gather the trackings due
+        trackings = []
+        todel = {}
         for guild in self.bot.get_guilds_by_module("oc"):
             try:
-
                 config = self.bot.get_guild_configuration_by_module(guild, "oc", check_key="currents")
                 if not config:
                     logging.debug(f"[oc/notifications] <{guild}> No OC tracking")
                     continue
 
-                if not self.bot.get_guild_beta(guild):
-                    logging.debug(f"[oc/notifications] <{guild}> Skip OC beta because this server is not beta tester")
-                    continue
-
-                logging.debug(f"[oc/notifications] <{guild}>  OC tracking")
-
-                # iteration over all members asking for oc watch
-                # guild = self.bot.get_guild(guild.id)
-                todel = []
-                tochange = {}
+                renderer = self.renderers["v2" if self.bot.get_guild_beta(guild) else "legacy"]
                 for discord_user_id, oc in config["currents"].items():
-                    # logging.debug(f"[oc/notifications] {guild}: {oc}")
-
-                    # call oc faction
-                    previous_mentions = list(oc.get("mentions", []))
-                    status = await self._oc_v2(guild, oc, config.get("notifications", {}))
+                    # skip if nothing is due
+                    key = (guild.id, discord_user_id)
+                    if self.oc_next.get(key, 0) > ts_now():
+                        continue
 
-                    if status and previous_mentions != oc.get("mentions", []):
-                        tochange[discord_user_id] = oc
-                    elif not status:
-                        todel.append(discord_user_id)
+                    channel, reason = await self._oc_tracking(guild, discord_user_id, oc)
+                    if channel is None:
+                        logging.debug(f"[oc/notifications] <{guild}> stop tracking {discord_user_id}: {reason}")
+                        todel.setdefault(guild, []).append(discord_user_id)
+                        continue
 
-                changes = False
-                for d in todel:
-                    logging.debug(f"[oc/notifications] <{guild}> delete current {d}")
-                    del self.bot.configurations[guild.id]["oc"]["currents"][d]
-                    changes = True
-
-                for discord_user_id, oc in tochange.items():
-                    logging.debug(f"[oc/notifications] <{guild}> change current {discord_user_id}")
-                    self.bot.configurations[guild.id]["oc"]["currents"][discord_user_id] = oc
-                    changes = True
-
-                if changes:
-                    await set_configuration(self.bot.bot_id, guild.id, guild.name, self.bot.configurations[guild.id])
-                    logging.debug(f"[oc/notifications] <{guild}> push notifications")
-                else:
-                    logging.debug(f"[oc/notifications] <{guild}> don't push notifications")
+                    trackings.append({"key": key, "guild": guild, "oc": oc, "channel": channel, "renderer": renderer,
+                                      "notifications": config.get("notifications", {})})
 
             except BaseException as e:
                 logging.error(f'[oc/notifications] {guild} [{guild.id}]: {hide_key(e)}')
@@ -599,57 +525,80 @@ class Crimes(commands.Cog):
                 headers = {"guild": guild, "guild_id": guild.id, "error": "error on oc notifications"}
                 await self.bot.send_log_main(e, headers=headers, full=True)
 
-    @tasks.loop(seconds=300)
-    async def ocTask(self):
-        logging.debug(f"[oc/notifications] start task")
+        # step 2: group trackings by faction (known from previous calls) or by key
+        groups = {}
+        for t in trackings:
+            fId = self.oc_factions.get(t["key"])
+            group = f'f{fId}' if fId else f'k{t["oc"]["torn_user"][3]}'
+            groups.setdefault(group, []).append(t)
 
-        # iteration over all guilds
-        for guild in self.bot.get_guilds_by_module("oc"):
+        # step 3: fetch and diff once per faction then render for each tracking
+        tochange = {}
+        for group, group_trackings in groups.items():
             try:
-
-                config = self.bot.get_guild_configuration_by_module(guild, "oc", check_key="currents")
-                if not config:
-                    logging.debug(f"[oc/notifications] <{guild}> No OC tracking")
+                response, stop, used = await self._oc_fetch(group_trackings)
+                for t in group_trackings:
+                    if t["key"] in stop:
+                        todel.setdefault(t["guild"], []).append(t["key"][1])
+                    else:
+                        # default recheck if the call failed
+                        self.oc_next[t["key"]] = ts_now() + OC_RECHECK
+
+                if response is None:
                     continue
 
-                if self.bot.get_guild_beta(guild):
-                    logging.debug(f"[oc/notifications] <{guild}> Skip OC because because server is beta tester")
-                    continue
-
-                logging.debug(f"[oc/notifications] <{guild}>  OC tracking")
-
-                # iteration over all members asking for oc watch
-                # guild = self.bot.get_guild(guild.id)
-                todel = []
-                tochange = {}
-                for discord_user_id, oc in config["currents"].items():
-                    # logging.debug(f"[oc/notifications] {guild}: {oc}")
-
-                    # call oc faction
-                    previous_mentions = list(oc.get("mentions", []))
-                    status = await self._oc(guild, oc)
+                # the key owner changed faction: regroup the others on next tick
+                if group[0] == "f" and str(response["ID"]) != group[1:]:
+                    for t in group_trackings:
+                        if t is not used:
+                            self.oc_factions.pop(t["key"], None)
+                            self.oc_next[t["key"]] = 0
+                    group_trackings = [used]
+
+                faction = {
+                    "id": response["ID"],
+                    "name": html.unescape(response["name"]),
+                    "members": response["members"],
+                    "timestamp": response.get("timestamp", ts_now()),
+                    "crimes": self._oc_diff(response)}
+                next_ts = self._oc_next_ts(faction["crimes"], faction["timestamp"])
+                logging.debug(f'[oc/notifications] faction {faction["id"]}: {len(group_trackings)} tracking(s), next poll in {s_to_hms(next_ts - faction["timestamp"])}')
+
+                for t in group_trackings:
+                    if t["key"] in stop:
+                        continue
+
+                    self.oc_factions[t["key"]] = faction["id"]
+                    self.oc_next[t["key"]] = next_ts
+
+                    previous_mentions = list(t["oc"].get("mentions", []))
+                    await t["renderer"].run(t, faction)
+                    if previous_mentions != t["oc"].get("mentions", []):
+                        tochange.setdefault(t["guild"], {})[t["key"][1]] = t["oc"]
 
-                    if status and previous_mentions != oc.get("mentions", []):
-                        tochange[discord_user_id] = oc
-                    elif not status:
-                        todel.append(discord_user_id)
+            except BaseException as e:
+                guild = group_trackings[0]["guild"]
+                logging.error(f'[oc/notifications] {guild} [{guild.id}]: {hide_key(e)}')
+                await self.bot.send_log(f'error on oc notifications: {e}', guild_id=guild.id)
+                headers = {"guild": guild, "guild_id": guild.id, "error": "error on oc notifications"}
+                await self.bot.send_log_main(e, headers=headers, full=True)
 
-                changes = False
-                for d in todel:
+        # step 4: persist once per guild
+        for guild in set(list(todel) + list(tochange)):
+            try:
+                for d in todel.get(guild, []):
                     logging.debug(f"[oc/notifications] <{guild}> delete current {d}")
-                    del self.bot.configurations[guild.id]["oc"]["currents"][d]
-                    changes = True
+                    self.bot.configurations[guild.id]["oc"]["currents"].pop(d, None)
+                    self.oc_next.pop((guild.id, d), None)
+                    self.oc_factions.pop((guild.id, d), None)
 
-                for discord_user_id, oc in tochange.items():
-                    logging.debug(f"[oc/notifications] <{guild}> change current {discord_user_id}")
-                    self.bot.configurations[guild.id]["oc"]["currents"][discord_user_id] = oc
-                    changes = True
+                for discord_user_id, oc in tochange.get(guild, {}).items():
+                    if discord_user_id in self.bot.configurations[guild.id]["oc"]["currents"]:
+                        logging.debug(f"[oc/notifications] <{guild}> change current {discord_user_id}")
+                        self.bot.configurations[guild.id]["oc"]["currents"][discord_user_id] = oc
 
-                if changes:
-                    await set_configuration(self.bot.bot_id, guild.id, guild.name, self.bot.configurations[guild.id])
-                    logging.debug(f"[oc/notifications] <{guild}> push notifications")
-                else:
-                    logging.debug(f"[oc/notifications] <{guild}> don't push notifications")
+                await set_configuration(self.bot.bot_id, guild.id, guild.name, self.bot.configurations[guild.id])
+                logging.debug(f"[oc/notifications] <{guild}> push notifications")
 
             except BaseException as e:
                 logging.error(f'[oc/notifications] {guild} [{guild.id}]: {hide_key(e)}')
@@ -657,10 +606,9 @@ class Crimes(commands.Cog):
                 headers = {"guild": guild, "guild_id": guild.id, "error": "error on oc notifications"}
                 await self.bot.send_log_main(e, headers=headers, full=True)
 
+        for renderer in self.renderers.values():
+            logging.debug(f'[oc/notifications] renderer {renderer.name}: {renderer.metrics}')
+
     @ocTask.before_loop
     async def before_ocTask(self):
         await self.bot.wait_until_ready()
-
-    @ocTask_v2.before_loop
-    async def before_ocTask_v2(self):
-        await self.bot.wait_until_ready()
@@ -35,27 +35,36 @@ from discord import Embed
 
 # import bot functions and classes
 from inc.handy import *
-from inc.yata_db import get_loots
-from inc.yata_db import get_scheduled
-from inc.yata_db import get_npc
+from inc.yata_db import get_loot_timeline
 
 
 class Loot(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.notify_4.start()
-        self.notify_5.start()
-        self.scheduled.start()
 
         self.lvl_roman = {0: "Hospitalized", 1: "I", 2: "II", 3: "III", 4: "IV", 5: "V"}
         self.roman_lvl = {"Hospitalized": 0, "I": 1, "II": 2, "III": 3, "IV": 4, "V": 5}
         self.lvl_dt = {0: 0, 1: 0, 2: 30 * 60, 3: 90 * 60, 4: 210 * 60, 5: 450 * 60}
         self.lvl_to_display = [4, 5]
 
+        # in memory NPC timeline and scheduled attacks refreshed from YATA db
+        # key: torn id, value: {"name": name, "hosp": hospital timestamp, "levels": {level: timestamp}}
+        self.npcs = {}
+        self.npcs_ts = 0
+        self.scheduled_attacks = []
+
+        # level alerts are fired by the bot scheduler 7 minutes before the level
+        # key: (npc id, level), value: hospital timestamp of the last alert sent
+        self.alert_offset = 7 * 60
+        self.alerts_sent = {}
+
+        self.refresh.start()
+        self.scheduled.start()
+
     def cog_unload(self):
-        self.notify_4.cancel()
-        self.notify_5.cancel()
+        self.refresh.cancel()
         self.scheduled.cancel()
+        self.bot.scheduler.cancel_all(("loot",))
 
     # def botMessages(self, message):
     #     return message.author.id == self.bot.user.id and message.content[:6] == "```ARM"
@@ -79,27 +88,26 @@ class Loot(commands.Cog):
 
         now = ts_now()
 
-        # get npc timings from YATA db
-        loots_raw = await get_loots()
+        # get npc timings from the in memory timeline
+        if not self.npcs_ts:
+            await self._refresh()
         loots = {}
 
-        for loot in loots_raw:
-            name = loot.get("name")
-            hosp = loot.get("hospitalTS")
-
+        for npc_id, npc in self.npcs.items():
             # get current loot level
             lvlc = 0  # current level
-            for lv, dt in self.lvl_dt.items():
-                lvlc = lv if now > hosp + dt else lvlc
+            for lv, ts in npc["levels"].items():
+                lvlc = lv if now > ts else lvlc
 
-            loots[loot.get("tId")] = {'name': name, 'hosp': hosp, 'lvlc': lvlc, 'timings': []}
+            loots[npc_id] = {'name': npc["name"], 'hosp': npc["hosp"], 'lvlc': lvlc, 'timings': []}
 
             # get all loot level timings
             for i in self.lvl_to_display:
-                timing = {"due": hosp + self.lvl_dt[i] - now, "time": hosp + self.lvl_dt[i], "lvl": i}
-                loots[loot.get("tId")]["timings"].append(timing)
+                timing = {"due": npc["levels"][i] - now, "time": npc["levels"][i], "lvl": i}
+                loots[npc_id]["timings"].append(timing)
 
         # get NPC from the database and loop
+        ebs = []
         for id, npc in loots.items():
             description_list = []
             name = npc["name"]
@@ -121,7 +129,10 @@ class Loot(commands.Cog):
             eb = Embed(description="\n".join(description_list),color=my_blue)
             eb.set_author(name=f'{npc["name"]} [{id}]', url=f'https://www.torn.com/loader.php?sid=attack&user2ID={id}', icon_url=f'https://yata.yt/media/loot/npc_{id}.png')
             eb.set_thumbnail(url=f'https://yata.yt/media/loot/loot_lvl_{lvlc}.png')
-            await ctx.send(embed=eb)
+            ebs.append(eb)
+
+        if len(ebs):
+            await send(ctx, embeds=ebs)
 
         # clean messages
         # await ctx.message.delete()
@@ -129,59 +140,72 @@ class Loot(commands.Cog):
         # async for m in ctx.channel.history(limit=10, before=ctx.message).filter(self.botMessages):
         #     await m.delete()
 
-    async def notify(self, level):
-        logging.debug(f"[loot/notifications_{level}] start task")
-
-        # get npc timings from YATA db
-        loots_raw = await get_loots()
-        loots = {}
+    async def _refresh(self):
+        """ reloads the NPC timeline and the scheduled attacks from YATA db
+            and precomputes the timestamps of all loot levels
+        """
+        loots_raw, scheduled_raw = await get_loot_timeline()
+        self.scheduled_attacks = scheduled_raw
+        npcs = {}
         for loot in loots_raw:
-            name = loot.get("name")
-            ts = loot.get("hospitalTS") + self.lvl_dt[level]
-            due = ts - ts_now()
-            loots[loot.get("tId")] = { 'name': name, 'due': due, 'ts':  ts }
+            hosp = loot.get("hospitalTS")
+            npcs[loot.get("tId")] = {'name': loot.get("name"), 'hosp': hosp, 'levels': {lvl: hosp + dt for lvl, dt in self.lvl_dt.items()}}
 
-        # loop over NPCs
-        mentions = []
-        embeds = []
-        nextDue = []
-        for npc_id, npc in loots.items():
-            due = npc["due"]
-            ts = npc["ts"]
+        self.npcs = npcs
+        self.npcs_ts = ts_now()
+        logging.debug(f"[loot/refresh] {len(npcs)} NPCs loaded")
 
-            if due > -60 and due < 10 * 60:
-                notification = "{} {}".format(npc["name"], "in " + s_to_ms(due) if due > 0 else "now")
-                mentions.append(notification)
+        # (re)schedule level alerts
+        self._schedule_alerts()
 
-                # author field
-                author = f'{npc["name"]} [{npc_id}]'
-                author_icon = f"https://yata.yt/media/loot/npc_{npc_id}.png"
-                author_url = f'https://www.torn.com/loader.php?sid=attack&user2ID={npc_id}'
+    def _schedule_alerts(self):
+        """ registers one timer per NPC and level at the alert offset
+            timers of an NPC are replaced if its hospital timestamp changed
+        """
+        now = ts_now()
+        for npc_id, npc in self.npcs.items():
+            for level in self.lvl_to_display:
+                # skip levels reached or already notified for this hospitalization
+                if npc["levels"][level] <= now or self.alerts_sent.get((npc_id, level)) == npc["hosp"]:
+                    continue
+                alert_ts = max(npc["levels"][level] - self.alert_offset, now)
+                self.bot.scheduler.schedule(("loot", npc_id, level), alert_ts, self.notify, npc_id, level)
 
-                # description field
-                description = f'Loot {self.lvl_roman[level]} {"since" if due < 0 else "in"} {s_to_time(abs(due))}'
-                embed = Embed(description=description, color=my_blue)
-                embed.set_author(name=author, url=author_url, icon_url=author_icon)
-                embed = append_update(embed, ts, text="At ")
+    async def notify(self, npc_id, level):
+        npc = self.npcs.get(npc_id)
+        if npc is None:
+            return
 
-                embeds.append(embed)
-                logging.debug(f'[loot/notifications_{level}] {npc["name"]}: notify (due {due})')
-            elif due > 0:
-                # used for computing sleeping time
-                nextDue.append(due)
-                logging.debug(f'[loot/notifications_{level}] {npc["name"]}: ignore (due {due})')
-            else:
-                logging.debug(f'[loot/notifications_{level}] {npc["name"]}: ignore (due {due})')
-
-        # get the sleeping time (15 minutes all dues < 0 or 5 minutes before next due)
-        nextDue = sorted(nextDue, reverse=False) if len(nextDue) else [15 * 60]
-        s = nextDue[0] - 7 * 60 - 5  # next due - 7 minutes - 5 seconds of the task ticker
-        logging.debug(f"[loot/notifications_{level}] end task... sleeping for {s_to_hms(s)} minutes.")
+        # remember the alert to fire it once per hospitalization
+        self.alerts_sent[(npc_id, level)] = npc["hosp"]
+
+        ts = npc["levels"][level]
+        due = ts - ts_now()
+        logging.debug(f'[loot/notifications_{level}] {npc["name"]}: notify (due {due})')
+
+        notification = "{} {}".format(npc["name"], "in " + s_to_ms(due) if due > 0 else "now")
+
+        # author field
+        author = f'{npc["name"]} [{npc_id}]'
+        author_icon = f"https://yata.yt/media/loot/npc_{npc_id}.png"
+        author_url = f'https://www.torn.com/loader.php?sid=attack&user2ID={npc_id}'
+
+        # description field
+        description = f'Loot {self.lvl_roman[level]} {"since" if due < 0 else "in"} {s_to_time(abs(due))}'
+        embed = Embed(description=description, color=my_blue)
+        embed.set_author(name=author, url=author_url, icon_url=author_icon)
+        embed = append_update(embed, ts, text="At ")
+
+        await self._broadcast([notification], [embed])
+
+    async def _broadcast(self, mentions, embeds):
+        # shortened and serialized once for all guilds
+        payloads = [embed_payload(e) for e in embeds]
 
         # iteration over all guilds
         for guild in self.bot.get_guilds_by_module("loot"):
             try:
-                logging.debug(f"[loot/notifications_{level}] {guild}")
+                logging.debug(f"[loot/notifications] {guild}")
 
                 config = self.bot.get_guild_configuration_by_module(guild, "loot", check_key="channels_alerts")
                 if not config:
@@ -195,57 +219,48 @@ class Loot(commands.Cog):
                     continue
 
                 # loop of npcs to mentions
-                for m, e in zip(mentions, embeds):
+                for m, payload in zip(mentions, payloads):
                     logging.debug(f"[LOOT] guild {guild}: mention {m}.")
                     msg = f'{m} {"" if role is None else role.mention}'
-                    await channel.send(msg, embed=e)
+                    await send_payload(self.bot, channel, msg, payload)
 
             except BaseException as e:
-                logging.error(f'[loot/notifications_{level}] {guild} [{guild.id}]: {hide_key(e)}')
+                logging.error(f'[loot/notifications] {guild} [{guild.id}]: {hide_key(e)}')
                 await self.bot.send_log(f'Error during a loot alert: {e}', guild_id=guild.id)
                 headers = {"guild": guild, "guild_id": guild.id, "error": "error on loot notifications"}
                 await self.bot.send_log_main(e, headers=headers, full=True)
 
-        # sleeps
-        logging.debug(f"[loot/notifications_{level}] sleep for {s} seconds")
-        await asyncio.sleep(s)
-
-    @tasks.loop(seconds=5)
-    async def notify_4(self):
-        await self.notify(4)
-
-    @tasks.loop(seconds=5)
-    async def notify_5(self):
-        await self.notify(5)
+    @tasks.loop(minutes=5)
+    async def refresh(self):
+        logging.debug("[loot/refresh] start task")
+        try:
+            await self._refresh()
+        except BaseException as e:
+            logging.error(f'[loot/refresh] {hide_key(e)}')
+            headers = {"error": "error on loot timeline refresh"}
+            await self.bot.send_log_main(e, headers=headers, full=True)
 
     @tasks.loop(minutes=10)
     async def scheduled(self):
         logging.debug("[loot/scheduled] start task")
 
-        loots_raw = await get_scheduled()
-
+        # scheduled attacks (with their NPC) from the in memory cache
         mentions = []
         embeds = []
-        for loot in loots_raw:
+        for loot in self.scheduled_attacks:
             if loot.get("vote") < 25:
                 continue
 
             due = loot.get("timestamp") - ts_now()
             # if True:
             if due < 10 * 60:
-                # get NPC
-                npc = await get_npc(loot.get("npc_id"))
-                if not len(npc):
-                    continue
-
-                npc = npc[0]
-                notification = "{} {}".format(npc["name"], "in " + s_to_ms(due) if due > 0 else "now")
+                notification = "{} {}".format(loot["npc_name"], "in " + s_to_ms(due) if due > 0 else "now")
                 mentions.append(notification)
 
                 # author field
-                author = f'{npc["name"]} [{npc["tId"]}]'
-                author_icon = f'https://yata.yt/media/loot/npc_{npc["tId"]}.png'
-                author_url = f'https://www.torn.com/loader.php?sid=attack&user2ID={npc["tId"]}'
+                author = f'{loot["npc_name"]} [{loot["npc_tid"]}]'
+                author_icon = f'https://yata.yt/media/loot/npc_{loot["npc_tid"]}.png'
+                author_url = f'https://www.torn.com/loader.php?sid=attack&user2ID={loot["npc_tid"]}'
 
                 # description field
                 description = f'Scheduled attack by {loot.get("vote")} players in {s_to_time(abs(due))}'
@@ -258,42 +273,14 @@ class Loot(commands.Cog):
         if not len(mentions):
             return
 
-        # iteration over all guilds
-        for guild in self.bot.get_guilds_by_module("loot"):
-            try:
-                logging.debug(f"[loot/notifications] {guild}")
-
-                config = self.bot.get_guild_configuration_by_module(guild, "loot", check_key="channels_alerts")
-                if not config:
-                    continue
-
-                # get role & channel
-                role = self.bot.get_module_role(guild.roles, config.get("roles_alerts", {}))
-                channel = self.bot.get_module_channel(guild.channels, config.get("channels_alerts", {}))
-
-                if channel is None:
-                    continue
-
-                # loop of npcs to mentions
-                for m, e in zip(mentions, embeds):
-                    logging.debug(f"[LOOT] guild {guild}: mention {m}.")
-                    msg = f'{m} {"" if role is None else role.mention}'
-                    await channel.send(msg, embed=e)
-
-            except BaseException as e:
-                logging.error(f'[loot/notifications] {guild} [{guild.id}]: {hide_key(e)}')
-                await self.bot.send_log(f'Error during a loot alert: {e}', guild_id=guild.id)
-                headers = {"guild": guild, "guild_id": guild.id, "error": "error on loot notifications"}
-                await self.bot.send_log_main(e, headers=headers, full=True)
-
-    @notify_4.before_loop
-    async def before_notify_4(self):
-        await self.bot.wait_until_ready()
+        await self._broadcast(mentions, embeds)
 
-    @notify_5.before_loop
-    async def before_notify_5(self):
+    @refresh.before_loop
+    async def before_refresh(self):
         await self.bot.wait_until_ready()
 
     @scheduled.before_loop
     async def before_scheduled(self):
         await self.bot.wait_until_ready()
+        if not self.npcs_ts:
+            await self._refresh()
@@ -33,8 +33,6 @@ from discord.ext import tasks
 from discord import Embed
 
 # import bot functions and classes
-from inc.yata_db import get_data
-from inc.yata_db import push_data
 from inc.yata_db import get_faction_name
 from inc.handy import *
 
@@ -42,43 +40,23 @@ from inc.handy import *
 class Racket(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.racketsTask.start()
+        self.bot.territory.subscribe(self.notify, ["racket_new", "racket_level", "racket_vanished", "racket_war"])
 
     def cog_unload(self):
-        self.racketsTask.cancel()
+        self.bot.territory.unsubscribe(self.notify)
 
-    @tasks.loop(minutes=5)
-    async def racketsTask(self):
-        logging.debug("[racket/notifications] start task")
-
-        guild = self.bot.get_guild(self.bot.main_server_id)
-        _, _, key = await self.bot.get_master_key(guild)
-
-        if key is None:
-            logging.error(f"[racket/notifications] Error no key found for on main server id {self.bot.main_server_id}")
-            return
-
-        response, e = await self.bot.api_call("torn", "", ["rackets", "territory", "timestamp"], key)
-        if e:
-            logging.error(f"[racket/notifications] Error {e}")
-            return
-
-        _, randt_p = get_data(self.bot.bot_id, "rackets")
-        rackets_p = randt_p["rackets"] if "rackets" in randt_p else {}
-        territory_p = randt_p["territory"] if "territory" in randt_p else {}
+    async def notify(self, events, snapshot):
+        logging.debug("[racket/notifications] start notifications")
 
         mentions = []
-        for k, v in response["rackets"].items():
-            title = False
-            war = v.get("war", False)
-            # New racket
-            if k not in rackets_p:
-                title = "New racket"
+        for event, k, v, v_p in events:
+            if event in ["racket_new", "racket_level"]:
+                war = v.get("war", False)
+                if event == "racket_new":
+                    title = "New racket"
+                else:
+                    title = f'Racket moved {"up" if v["level"] > v_p["level"] else "down"} from {v_p["level"]} to {v["level"]}'
 
-            elif v["level"] != rackets_p[k]["level"]:
-                title = f'Racket moved {"up" if v["level"] > rackets_p[k]["level"] else "down"} from {rackets_p[k]["level"]} to {v["level"]}'
-
-            if title:
                 factionO = await get_faction_name(v["faction"])
                 embed = Embed(title=title, description=f'[{v["name"]} at {k}](https://www.torn.com/city.php#terrName={k})', color=my_blue)
 
@@ -97,34 +75,23 @@ class Racket(commands.Cog):
                 embed.set_footer(text=f'{ts_to_datetime(v["changed"], fmt="short")}')
                 mentions.append(embed)
 
-        for k, v in rackets_p.items():
-            if k not in response["rackets"]:
-                factionO = await get_faction_name(v["faction"])
-                embed = Embed(title=f'Racket vanished', description=f'[{v["name"]} at {k}](https://www.torn.com/city.php#terrName={k})', color=my_blue)
-                embed.add_field(name='Reward', value=f'{v["reward"]}')
+            elif event == "racket_vanished":
+                factionO = await get_faction_name(v_p["faction"])
+                embed = Embed(title=f'Racket vanished', description=f'[{v_p["name"]} at {k}](https://www.torn.com/city.php#terrName={k})', color=my_blue)
+                embed.add_field(name='Reward', value=f'{v_p["reward"]}')
                 embed.add_field(name='Territory', value=f'{k}')
-                embed.add_field(name='Level', value=f'{v["level"]}')
+                embed.add_field(name='Level', value=f'{v_p["level"]}')
 
-                embed.add_field(name='Owner', value=f'[{html.unescape(factionO)}](https://www.torn.com/factions.php?step=profile&ID={v["faction"]})')
+                embed.add_field(name='Owner', value=f'[{html.unescape(factionO)}](https://www.torn.com/factions.php?step=profile&ID={v_p["faction"]})')
 
                 embed.set_thumbnail(url=f'https://yata.yt/media/territories/50x50/{k}.png')
-                # embed.set_footer(text=f'Created {ts_to_datetime(v["created"], fmt="short")} Changed {ts_to_datetime(v["changed"], fmt="short")}')
-                embed.set_footer(text=f'{ts_to_datetime(v["changed"], fmt="short")}')
+                embed.set_footer(text=f'{ts_to_datetime(v_p["changed"], fmt="short")}')
                 mentions.append(embed)
 
-        # response["territory"]["TVG"]["war"] = {"assaulting_faction": 44974, "defending_faction": 44974, "started": 1586510047, "ends": 1586769247}
-
-        for k, v in response["territory"].items():
-            title = False
-            war = v.get("war", False)
-            racket = v.get("racket", False)
-            if not (war and racket):
-                continue
-
-            # New war
-            if not territory_p[k].get("war", False):
-                factionO = await get_faction_name(v["faction"])
-                factionA = await get_faction_name(v["war"]["assaulting_faction"])
+            elif event == "racket_war":
+                racket = snapshot["rackets"][k]
+                factionO = await get_faction_name(v["defending_faction"])
+                factionA = await get_faction_name(v["assaulting_faction"])
                 title = f'New war for a {racket["name"]}'
                 embed = Embed(title=title, description=f'[{racket["name"]} at {k}](https://www.torn.com/city.php#terrName={k})', color=my_blue)
 
@@ -132,28 +99,23 @@ class Racket(commands.Cog):
                 embed.add_field(name='Territory', value=f'{k}')
                 embed.add_field(name='Level', value=f'{racket["level"]}')
 
-                embed.add_field(name='Owner', value=f'[{html.unescape(factionO)}](https://www.torn.com/factions.php?step=profile&ID={v["faction"]})')
-                warId = v["war"]["assaulting_faction"]
+                embed.add_field(name='Owner', value=f'[{html.unescape(factionO)}](https://www.torn.com/factions.php?step=profile&ID={v["defending_faction"]})')
+                warId = v["assaulting_faction"]
                 embed.add_field(name='Assaulting', value=f'[{html.unescape(factionA)}](https://www.torn.com/factions.php?step=profile&ID={warId})')
 
                 embed.set_thumbnail(url=f'https://yata.yt/media/territories/50x50/{k}.png')
-                # embed.set_footer(text=f'Created {ts_to_datetime(v["created"], fmt="short")} Changed {ts_to_datetime(v["changed"], fmt="short")}')
                 embed.set_footer(text=f'{ts_to_datetime(racket["changed"], fmt="short")}')
                 mentions.append(embed)
 
         logging.debug(f'[racket/notifications] mentions: {len(mentions)}')
 
-        logging.debug(f"[racket/notifications] push rackets")
-        await push_data(self.bot.bot_id, int(response["timestamp"]), response, "rackets")
-
-        # DEBUG
-        # embed = Embed(title="Test Racket")
-        # mentions.append(embed)
-
         if not len(mentions):
             logging.debug(f"[racket/notifications] no notifications")
             return
 
+        # shortened and serialized once for all guilds
+        payloads = [embed_payload(m) for m in mentions]
+
         # iteration over all guilds
         for guild in self.bot.get_guilds_by_module("rackets"):
             try:
@@ -171,15 +133,11 @@ class Racket(commands.Cog):
                 if channel is None:
                     continue
 
-                for m in mentions:
-                    msg = await channel.send('' if role is None else f'Rackets update {role.mention}', embed=m)
+                for payload in payloads:
+                    await send_payload(self.bot, channel, '' if role is None else f'Rackets update {role.mention}', payload)
 
             except BaseException as e:
                 logging.error(f'[racket/notifications] {guild} [{guild.id}]: {hide_key(e)}')
                 await self.bot.send_log(f'Error during a racket alert: {e}', guild_id=guild.id)
                 headers = {"guild": guild, "guild_id": guild.id, "error": "error on racket notifications"}
                 await self.bot.send_log_main(e, headers=headers, full=True)
-
-    @racketsTask.before_loop
-    async def before_racketsTask(self):
-        await self.bot.wait_until_ready()
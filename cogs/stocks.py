@@ -23,7 +23,12 @@ import aiohttp
 import json
 import datetime
 import re
+import time
+import html
+import collections
+import math
 import logging
+import numpy as np
 # import termplotlib as tpl
 
 # import discord modules
@@ -35,29 +40,147 @@ from discord import Embed
 # import bot functions and classes
 from inc.yata_db import get_data
 from inc.yata_db import push_data
+from inc.timeseries import RingBuffer
 from inc.handy import *
 
+# members of a sharing group collected at the same time
+STOCKS_PARALLEL = 8
+# minimum delay between two edits of the collection embed
+STOCKS_EDIT_DELAY = 2
+
+# stocks of the sharing groups: acronym, id and requirement used until the metadata are loaded
+STOCKS_GROUPS = {
+    "wssb": [("WSSB", 25, 1000000), ("ISTC", 26, 100000)],
+    "tcb": [("TCB", 2, 1500000)],
+}
+
+# stocks alerts: seconds between two records, number of records kept and moving average window (in records)
+STOCKS_RECORD = 300
+STOCKS_HISTORY = 576
+STOCKS_MA_WINDOW = 288
+STOCKS_MA_MIN = 12
+STOCKS_FORECASTS = {"Very Poor": 0, "Poor": 1, "Average": 2, "Good": 3, "Very Good": 4}
+
+# relative width of the price buckets used to fingerprint alerts
+STOCKS_PRICE_BUCKET = 1.05
+
+# jump of available shares (fraction of the total shares) considered as a system injection
+STOCKS_INJECTION = 0.01
+
+StockInfo = collections.namedtuple("StockInfo", ["id", "acronym", "name", "requirement", "description"])
+
 
 class Stocks(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+
+        # stocks metadata loaded from the torn API
+        # key: stock id, value: StockInfo
+        self.stocks_info = {}
+        self.stocks_acronyms = {}
+
+        # fingerprints of the alerts sent (loaded from the database on first tick)
+        self.alert_keys = None
+
+        # snapshots of the sharing groups and collections running
+        # key: (guild id, stock)
+        self.snapshots = {}
+        self.collecting = {}
+
+        # prices, available and total shares and forecasts recorded from the torn API
+        self.series = RingBuffer(STOCKS_HISTORY, ["price", "shares", "total", "forecast"])
+
         self.notify.start()
 
     def cog_unload(self):
         self.notify.cancel()
 
-    async def get_times(self, ctx, stock=""):
+    def _group_options(self, stock):
+        """ stocks of a sharing group from the metadata table
+            return {stock id: [name, requirement]}
+        """
+        so = {}
+        for acronym, stock_id, requirement in STOCKS_GROUPS[stock]:
+            info = self.stocks_info.get(self.stocks_acronyms.get(acronym, stock_id))
+            if info is not None:
+                stock_id, requirement = info.id, info.requirement
+            so[stock_id] = [acronym.lower(), requirement]
+        return so
+
+    def _times_embed(self, stock, timeLeft, stockOwners, done, total, age=None):
+        """ table of the time left and block owners of a sharing group
+            age: age of the snapshot in seconds when served from the cache
+        """
+        lst = ["```md"]
+        for k, v in sorted(timeLeft.items(), key=lambda x: x[1]):
+            own = f'{", ".join(stockOwners[k])}' if k in stockOwners else " "
+            lst.append(f'{k.replace("_", " "): <15} | {s_to_dhm(v)} |  {own}')
+        lst.append("```")
+
+        if stock == "tcb":
+            eb = Embed(title="List of investment time left and TCB owners", description="\n".join(lst), color=my_blue)
+            eb.set_thumbnail(url="https://yata.yt/media/stocks/2.png")
+        else:
+            eb = Embed(title="List of education time left and WSSB/ISTC owners", description="\n".join(lst), color=my_blue)
+            eb.set_thumbnail(url="https://yata.yt/media/stocks/25.png")
+
+        if done < total:
+            eb.set_footer(text=f'Collecting... {done}/{total} members')
+        elif age is not None:
+            eb.set_footer(text=f'Snapshot taken {s_to_time(age)} ago, use !{stock} refresh to update')
+
+        return eb
+
+    async def _collect(self, ctx, member, stock, so):
+        """ pulls the stock information of one member of a sharing group
+            return name, time left, stock owned, None: okay
+            return name, None, None, error: the member is not shown
+        """
+        # get user key from YATA database
+        status, _, name, key = await self.bot.get_user_key(False, member, needPerm=True, guild=ctx.guild)
+        if status < 0:
+            errors = {-1: "no master key given", -2: "master key API error", -3: "not officially verified by Torn", -4: "not in the YATA database"}
+            return member.display_name, None, None, errors.get(status, f'error getting API key ({status})')
+
+        # get information from API key
+        info = 'money' if stock == "tcb" else "education"
+        response, e = await self.bot.api_call("user", "", [info, "stocks", "discord", "timestamp"], key)
+        if e and 'error' in response:
+            return name, None, None, f'API error: {response["error"]["error"]}'
+
+        # send pull request to member
+        url = f'https://yata.yt/media/stocks/{2 if stock == "tcb" else 25}.png'
+        description = [
+            f'Your **{info}** information has just been pulled',
+            f'__Author__: {ctx.author.nick} ({ctx.author} [{ctx.author.id}])',
+            f'__Server__: {ctx.guild} [{ctx.guild.id}]',
+        ]
+        eb = Embed(title=f"Shared {stock.upper()} bonus block", description="\n\n".join(description), color=my_blue)
+        eb.set_footer(text=ts_to_datetime(response.get("timestamp", ts_now()), fmt="short"))
+        eb.set_thumbnail(url=url)
+        try:
+            await send(member, embed=eb)
+        except BaseException:
+            return name, None, None, 'DM couldn\'t be sent (most probably because they disable dms in privacy settings), for security reasons their information will not be shown'
+
+        # get stock owner
+        if response.get('stocks') is None:
+            owners = []
+        else:
+            owners = list(set([so[s["stock_id"]][0] for s in response.get('stocks', {}).values() if s["stock_id"] in so and s["shares"] >= so[s["stock_id"]][1]]))
+
+        # get time left
+        if stock == "tcb":
+            time_left = response.get('city_bank', dict({})).get("time_left", 0)
+        else:
+            time_left = response.get('education_timeleft', 0)
+
+        return name, time_left, owners, None
+
+    async def get_times(self, ctx, stock="", refresh=False):
 
         # options for different stocks
-        so = {
-            "wssb": {
-                25: ["wssb", 1000000],
-                26: ["istc", 100000],
-            },
-            "tcb": {
-                2: ["tcb", 1500000],
-            }
-        }
+        so = {stock: self._group_options(stock)}
 
         # get configuration
         config = self.bot.get_guild_configuration_by_module(ctx.guild, "stocks", check_key=f"channels_{stock}")
@@ -70,207 +193,236 @@ class Stocks(commands.Cog):
             return [], None
 
         # list all users
-        stockOwners = {}
-        timeLeft = dict()
         role = self.bot.get_module_role(ctx.guild.roles, config.get(f"roles_{stock}", {}))
         if role is None:
             await self.bot.send_error_message(ctx, f'No roles attributed to {stock}')
             return [], None
 
-        for member in role.members:
-            # get user key from YATA database
-            status, _, name, key = await self.bot.get_user_key(ctx, member, needPerm=True)
-            if status < 0:
-                continue
-
-            # get information from API key
-            info = 'money' if stock == "tcb" else "education"
-            response, e = await self.bot.api_call("user", "", [info, "stocks", "discord", "timestamp"], key)
-            if e and 'error' in response:
-                await self.bot.send_error_message(ctx, f'API error for {member.nick}\'s key: {response["error"]["error"]}')
-                continue
-
-            # send pull request to member
-            url = f'https://yata.yt/media/stocks/{2 if stock == "tcb" else 25}.png'
-            description = [
-                f'Your **{info}** information has just been pulled',
-                f'__Author__: {ctx.author.nick} ({ctx.author} [{ctx.author.id}])',
-                f'__Server__: {ctx.guild} [{ctx.guild.id}]',
-            ]
-            eb = Embed(title=f"Shared {stock.upper()} bonus block", description="\n\n".join(description), color=my_blue)
-            eb.set_footer(text=ts_to_datetime(response["timestamp"], fmt="short"))
-            eb.set_thumbnail(url=url)
+        key = (ctx.guild.id, stock)
+        snapshot = self.snapshots.get(key)
+        if key in self.collecting:
+            # coalesce with the collection already running for this group
+            snapshot = await asyncio.shield(self.collecting[key])
+
+        elif refresh or snapshot is None or ts_now() - snapshot["timestamp"] > self.bot.stocks_snapshot_ttl:
+            # new collection streamed in its own message
+            self.collecting[key] = asyncio.ensure_future(self._collect_group(ctx, stock, role.members, so[stock]))
             try:
-                await send(member, embed=eb)
-            except BaseException:
-                await self.bot.send_error_message(ctx, f'DM couldn\'t be sent to {member.nick} (most probably because they disable dms in privacy settings). For security reasons their information will not be shown.')
-                continue
-
-            # get stock owner
-            if response.get('stocks') is None:
-                stockOwners[name] = []
+                snapshot = await asyncio.shield(self.collecting[key])
+            finally:
+                self.collecting.pop(key, None)
+            self.snapshots[key] = snapshot
+            return snapshot["timeLeft"], snapshot["stockOwners"]
+
+        # serve the snapshot (time left shifted by its age)
+        age = ts_now() - snapshot["timestamp"]
+        timeLeft = {k: max(v - age, 0) for k, v in snapshot["timeLeft"].items()}
+        await send(ctx, embed=self._times_embed(stock, timeLeft, snapshot["stockOwners"], len(timeLeft), len(timeLeft), age=age))
+        return timeLeft, snapshot["stockOwners"]
+
+    async def _collect_group(self, ctx, stock, members, so):
+        """ collects the members of a sharing group concurrently (bounded)
+            and streams the results in the embed
+            returns the snapshot of the group
+        """
+        timeLeft = {}
+        stockOwners = {}
+        semaphore = asyncio.Semaphore(STOCKS_PARALLEL)
+
+        async def collect(member):
+            # errors end up in the summary so the other members are still collected and shown
+            async with semaphore:
+                try:
+                    return member, await self._collect(ctx, member, stock, so)
+                except asyncio.CancelledError:
+                    raise
+                except BaseException as e:
+                    logging.error(f'[stocks/collect] {ctx.guild}: {member}: {hide_key(e)}')
+                    return member, (member.display_name, None, None, f'error: {hide_key(e)}')
+
+        errors = []
+        msg = await send(ctx, embed=self._times_embed(stock, timeLeft, stockOwners, 0, len(members)))
+        last_edit = time.monotonic()
+        for i, task in enumerate(asyncio.as_completed([collect(m) for m in members])):
+            member, (name, time_left, owners, error) = await task
+            if error is None:
+                timeLeft[name] = time_left
+                stockOwners[name] = owners
             else:
-                stockOwners[name] = list(set([so[stock][s["stock_id"]][0] for s in response.get('stocks', {}).values() if s["stock_id"] in so[stock] and s["shares"] >= so[stock][s["stock_id"]][1]]))
-            # get time left
-            if stock == "tcb":
-                timeLeft[name] = response.get('city_bank', dict({})).get("time_left", 0)
-            elif stock == "wssb":
-                timeLeft[name] = response.get('education_timeleft', 0)
+                errors.append(f'**{member.display_name}**: {error}')
 
-        return timeLeft, stockOwners
+            if time.monotonic() - last_edit > STOCKS_EDIT_DELAY and i + 1 < len(members):
+                await msg.edit(embed=self._times_embed(stock, timeLeft, stockOwners, i + 1, len(members)))
+                last_edit = time.monotonic()
+
+        await msg.edit(embed=self._times_embed(stock, timeLeft, stockOwners, len(members), len(members)))
+
+        # one summary for all the members not shown
+        if len(errors):
+            await self.bot.send_error_message(ctx, "\n".join(errors), title=f'{len(errors)} member{"s" if len(errors) > 1 else ""} not shown')
+
+        return {"timestamp": ts_now(), "timeLeft": timeLeft, "stockOwners": stockOwners}
 
     @commands.command()
     @commands.bot_has_permissions(send_messages=True)
-    async def wssb(self, ctx):
-        """Display information for the WSSB sharing group"""
+    async def wssb(self, ctx, *args):
+        """Display information for the WSSB sharing group (`!wssb refresh` to force a new pull)"""
         logging.info(f'[stocks/wssb] {ctx.guild}: {ctx.author.nick} / {ctx.author}')
 
-        timeLeft, stockOwners = await self.get_times(ctx, stock="wssb")
-        lst = ["```md"]
-        if len(timeLeft):
-            # tmp = "{: <15} | {} | {}".format("NAME", "EDU TIME LEFT", "WSSB")
-            # lst.append(tmp)
-            # lst.append("-" * len(tmp))
-
-            for k, v in sorted(timeLeft.items(), key=lambda x: x[1]):
-                own = f'{", ".join(stockOwners[k])}' if k in stockOwners else " "
-                lst.append(f'{k.replace("_", " "): <15} | {s_to_dhm(v)} |  {own}')
-
-            lst.append("```")
-            eb = Embed(title="List of education time left and WSSB/ISTC owners", description="\n".join(lst), color=my_blue)
-            eb.set_thumbnail(url="https://yata.yt/media/stocks/25.png")
-            await send(ctx, embed=eb)
+        refresh = len(args) and args[0] in ["refresh", "force"]
+        await self.get_times(ctx, stock="wssb", refresh=refresh)
 
     @commands.command()
     @commands.bot_has_permissions(send_messages=True)
-    async def tcb(self, ctx):
-        """Display information for the TCB sharing group"""
+    async def tcb(self, ctx, *args):
+        """Display information for the TCB sharing group (`!tcb refresh` to force a new pull)"""
         logging.info(f'[stocks/tcb] {ctx.guild}: {ctx.author.nick} / {ctx.author}')
 
-        timeLeft, stockOwners = await self.get_times(ctx, stock="tcb")
-        lst = ["```md"]
-        if len(timeLeft):
-            # tmp = "{: <15} | {} | {}".format("NAME", "INV TIME LEFT", "TCB")
-            # lst.append(tmp)
-            # lst.append("-" * len(tmp))
-
-            for k, v in sorted(timeLeft.items(), key=lambda x: x[1]):
-                own = f'{", ".join(stockOwners[k])}' if k in stockOwners else " "
-                lst.append(f'{k.replace("_", " "): <15} | {s_to_dhm(v)} |  {own}')
-
-            lst.append("```")
-            eb = Embed(title="List of investment time left and TCB owners", description="\n".join(lst), color=my_blue)
-            eb.set_thumbnail(url="https://yata.yt/media/stocks/2.png")
-            await send(ctx, embed=eb)
-
-
-    # @tasks.loop(seconds=5)
-    @tasks.loop(seconds=600)
+        refresh = len(args) and args[0] in ["refresh", "force"]
+        await self.get_times(ctx, stock="tcb", refresh=refresh)
+
+    def _stock_info(self, stock_id):
+        """ metadata of a stock from the table (with a placeholder if unknown)
+        """
+        return self.stocks_info.get(int(stock_id), StockInfo(int(stock_id), "?", f"Stock #{stock_id}", 0, "Unknown"))
+
+    def _alert_fingerprint(self, stock_id, alert_type, price):
+        """ stable key of an alert: stock id, alert type and price bucket
+        """
+        bucket = int(math.floor(math.log(price) / math.log(STOCKS_PRICE_BUCKET))) if price > 0 else 0
+        return f'{stock_id}:{alert_type}:{bucket}'
+
+    async def _load_stocks_info(self):
+        """ loads the stocks metadata from the torn stocks selection
+            return the stocks of the response (None on error)
+        """
+        guild = self.bot.get_guild(self.bot.main_server_id)
+        _, _, key = await self.bot.get_master_key(guild)
+        if key is None:
+            logging.error(f"[stocks/info] Error no key found for on main server id {self.bot.main_server_id}")
+            return None
+
+        response, e = await self.bot.api_call("torn", "", ["stocks", "timestamp"], key, check_key=["stocks"])
+        if e:
+            logging.error(f'[stocks/info] API error {response["error"]["error"]}')
+            return None
+
+        stocks_info = {}
+        for k, v in response["stocks"].items():
+            benefit = v.get("benefit", {})
+            info = StockInfo(int(v.get("stock_id", k)), v.get("acronym", "?"), html.unescape(v.get("name", f"Stock #{k}")), int(benefit.get("requirement", 0)), benefit.get("description", "None"))
+            stocks_info[info.id] = info
+
+        self.stocks_info = stocks_info
+        self.stocks_acronyms = {v.acronym: k for k, v in stocks_info.items()}
+        logging.debug(f"[stocks/info] {len(stocks_info)} stocks loaded")
+        return response
+
+    def _record(self, response):
+        """ appends the prices, available and total shares and forecasts of the stocks selection to the time series
+        """
+        values = {}
+        for k, v in response["stocks"].items():
+            values[int(v.get("stock_id", k))] = {
+                "price": v.get("current_price"),
+                "shares": v.get("available_shares"),
+                "total": v.get("total_shares"),
+                "forecast": STOCKS_FORECASTS.get(v.get("forecast")),
+            }
+        self.series.append(response.get("timestamp", ts_now()), values)
+        logging.debug(f"[stocks/alerts] {len(values)} stocks recorded ({len(self.series)} records)")
+
+    def _evaluate(self):
+        """ alert conditions of the last record for all stocks at once
+            - below: price below the moving average, forecast moved from bad to good and shares available
+            - injection: total shares went up or available shares jumped by more than STOCKS_INJECTION of the total
+              (smaller increases are players selling)
+            return {stock id: list of alert types}
+        """
+        if len(self.series) < 2:
+            return {}
+
+        price = self.series.view("price")
+        shares = self.series.view("shares")
+        total = self.series.view("total")
+        forecast = self.series.view("forecast")
+        average = self.series.rolling_mean("price", STOCKS_MA_WINDOW, min_periods=STOCKS_MA_MIN)
+
+        # comparisons with nan (missing values) are False
+        with np.errstate(invalid="ignore"):
+            below = (price[-1] < average[-1]) & (forecast[-2] < STOCKS_FORECASTS["Average"]) & (forecast[-1] > STOCKS_FORECASTS["Average"]) & (shares[-1] > 0)
+            injection = (total[-1] > total[-2]) | (shares[-1] - shares[-2] > STOCKS_INJECTION * total[-1])
+
+        alerts = {}
+        for alert_type, mask in [("below", below), ("injection", injection)]:
+            for c in np.flatnonzero(mask):
+                alerts.setdefault(self.series.columns[c], []).append(alert_type)
+        return alerts
+
+    @tasks.loop(seconds=STOCKS_RECORD)
     async def notify(self):
         logging.debug(f"[stocks/alerts] start task")
 
-        _, mentions_keys_prev = get_data(self.bot.bot_id, "stocks")
-        mentions_keys_prev = mentions_keys_prev if len(mentions_keys_prev) else []  # make sure it's a list if empty
-        for k in mentions_keys_prev:
-            logging.debug(f"[stocks/alerts] previous alerts: {k}")
-        mentions_keys = []
+        # load previous alert fingerprints once
+        if self.alert_keys is None:
+            _, alert_keys = await self.bot.loop.run_in_executor(None, get_data, self.bot.bot_id, "stocks")
+            self.alert_keys = set([k for k in alert_keys if isinstance(k, str)]) if len(alert_keys) else set()
+            logging.debug(f"[stocks/alerts] {len(self.alert_keys)} previous alerts loaded")
+
+        alert_keys = set()
         mentions = []
         try:
-            stockInfo = {
-                "0": {"id": 0, "acro": "TCSE", "name": "Torn City Stock Exchange", "acronym": "TCSE", "director": "None", "benefit": {"requirement": 0, "description": "None"}},
-                "1": {"id": 1, "acro": "TSBC", "name": "Torn City and Shanghai Banking Corporation", "acronym": "TSBC", "director": "Mr. Gareth Davies", "benefit": {"requirement": 4000000, "description": "Entitled to receive occasional dividends"}},
-                "2": {"id": 2, "acro": "TCB", "name": "Torn City Investment Banking", "acronym": "TCB", "director": "Mr. Paul Davies", "benefit": {"requirement": 1500000, "description": "Entitled to receive improved interest rates"}},
-                "3": {"id": 3, "acro": "SYS", "name": "Syscore MFG", "acronym": "SYS", "director": "Mr. Stuart Bridgens", "benefit": {"requirement": 3000000, "description": "Entitled to receive supreme firewall software for you and your company"}},
-                "4": {"id": 4, "acro": "SLAG", "name": "Society and Legal Authorities Group", "acronym": "SLAG", "director": "Mr. Samuel Washington", "benefit": {"requirement": 1500000, "description": "Entitled to receive business cards from our lawyers"}},
-                "5": {"id": 5, "acro": "IOU", "name": "Insured On Us", "acronym": "IOU", "director": "Mr. Jordan Blake", "benefit": {"requirement": 3000000, "description": "Entitled to receive occasional dividends"}},
-                "6": {"id": 6, "acro": "GRN", "name": "Grain", "acronym": "GRN", "director": "Mr. Harry Abbott", "benefit": {"requirement": 500000, "description": "Entitled to receive occasional dividends"}},
-                "7": {"id": 7, "acro": "TCHS", "name": "Torn City Health Service", "acronym": "TCHS", "director": "Dr. Rick Lewis", "benefit": {"requirement": 150000, "description": "Entitled to receive occasional medical packs"}},
-                "8": {"id": 8, "acro": "YAZ", "name": "Yazoo", "acronym": "YAZ", "director": "Mr. Godfrey Cadberry", "benefit": {"requirement": 1000000, "description": "Entitled to receive free banner advertisement in the local newspaper"}},
-                "9": {"id": 9, "acro": "TCT", "name": "The Torn City Times", "acronym": "TCT", "director": "Mr. Micheal Cassinger", "benefit": {"requirement": 125000, "description": "Entitled to receive free personal placements in the newspaper"}},
-                "10": {"id": 10, "acro": "CNC", "name": "Crude & Co.", "acronym": "CNC", "director": "Mr. Bruce Hunter", "benefit": {"requirement": 5000000, "description": "Entitled to receive oil rig company sales boost"}},
-                "11": {"id": 11, "acro": "MSG", "name": "Messaging Inc.", "acronym": "MSG", "director": "Mr. Yazukini Chang", "benefit": {"requirement": 300000, "description": "Entitled to receive free advertisement placements in the newspaper"}},
-                "12": {"id": 12, "acro": "TMI", "name": "TC Music Industries", "acronym": "TMI", "director": "Mr. Benjamin Palmer", "benefit": {"requirement": 6000000, "description": "Entitled to receive occasional dividends"}},
-                "13": {"id": 13, "acro": "TCP", "name": "TC Media Productions", "acronym": "TCP", "director": "Mr. Richard Button", "benefit": {"requirement": 1000000, "description": "Entitled to receive support for your company (if you are the director) which should result in a 10% bonus to profits"}},
-                "14": {"id": 14, "acro": "IIL", "name": "I Industries Ltd.", "acronym": "IIL", "director": "Mr. Micheal Ibbs", "benefit": {"requirement": 100000, "description": "Entitled to receive software to improve coding time by 50%"}},
-                "15": {"id": 15, "acro": "FHG", "name": "Feathery Hotels Group", "acronym": "FHG", "director": "Mr. Jeremy Hedgemaster", "benefit": {"requirement": 2000000, "description": "Entitled to receive occasional coupons to stay in our hotels"}},
-                "16": {"id": 16, "acro": "SYM", "name": "Symbiotic Ltd.", "acronym": "SYM", "director": "Dr. Daniel Pieczko", "benefit": {"requirement": 500000, "description": "Entitled to receive occasional drug packs"}},
-                "17": {"id": 17, "acro": "LSC", "name": "Lucky Shots Casino", "acronym": "LSC", "director": "Mr. Martin Wong", "benefit": {"requirement": 100000, "description": "Entitled to receive occasional packs of 100x lottery tickets"}},
-                "18": {"id": 18, "acro": "PRN", "name": "Performance Ribaldry Network", "acronym": "PRN", "director": "Mr. Dylan 'Dick Ironhammer' Tansey", "benefit": {"requirement": 1500000, "description": "Entitled to receive occasional erotic DVDs"}},
-                "19": {"id": 19, "acro": "EWM", "name": "Eaglewood Mercenary", "acronym": "EWM", "director": "Mr. Jamie Frere Smith", "benefit": {"requirement": 2000000, "description": "Entitled to receive occasional grenade packs"}},
-                "20": {"id": 20, "acro": "TCM", "name": "Torn City Motors", "acronym": "TCM", "director": "Mr. George Blanksby", "benefit": {"requirement": 1000000, "description": "Entitled to receive a 25% discount when buying car parts"}},
-                "21": {"id": 21, "acro": "ELBT", "name": "The Empty Lunchbox Building Traders", "acronym": "ELBT", "director": "Mr. Jack Turner", "benefit": {"requirement": 5000000, "description": "Entitled to receive a 10% discount on all home upgrades (not including staff)"}},
-                "22": {"id": 22, "acro": "HRG", "name": "Home Retail Group", "acronym": "HRG", "director": "Mr. Owain Hughes", "benefit": {"requirement": 1500000, "description": "Entitled to receive occasional free properties"}},
-                "23": {"id": 23, "acro": "TGP", "name": "Tell Group Plc.", "acronym": "TGP", "director": "Mr. Jordan Urch", "benefit": {"requirement": 2500000, "description": "Entitled to receive a significant boost in company advertising (if you are the director)"}},
-                "25": {"id": 25, "acro": "WSSB", "name": "West Side South Bank University", "acronym": "WSSB", "director": "Mrs. Katherine Hamjoint", "benefit": {"requirement": 1000000, "description": "Entitled to receive a 10% time reduction for all newly started courses"}},
-                "26": {"id": 26, "acro": "ISTC", "name": "International School TC", "acronym": "ISTC", "director": "Miss. Mary Huff", "benefit": {"requirement": 100000, "description": "Entitled to receive free education"}},
-                "27": {"id": 27, "acro": "BAG", "name": "Big Al's Gun Shop", "acronym": "BAG", "director": "Mr. Jim Chapman", "benefit": {"requirement": 3000000, "description": "Entitled to receive occasional special ammunition packs"}},
-                "28": {"id": 28, "acro": "EVL", "name": "Evil Ducks Candy Corp", "acronym": "EVL", "director": "Mr. Adam French", "benefit": {"requirement": 1750000, "description": "Entitled to receive occasional happy boosts"}},
-                "29": {"id": 29, "acro": "MCS", "name": "Mc Smoogle Corp", "acronym": "MCS", "director": "Mr. Gofer Gloop", "benefit": {"requirement": 1750000, "description": "Entitled to receive occasional free meals"}},
-                "30": {"id": 30, "acro": "WLT", "name": "Wind Lines Travel", "acronym": "WLT", "director": "Sir. Fred Dunce", "benefit": {"requirement": 9000000, "description": "Entitled to receive access to our free private jet"}},
-                "31": {"id": 31, "acro": "TCC", "name": "Torn City Clothing", "acronym": "TCC", "director": "Mrs. Stella Patrick", "benefit": {"requirement": 350000, "description": "Entitled to receive occasional dividends"}},
-                "42": {"id": 42, "acro": "BUG", "name": "DEBUG", "benefit": {"requirement": 69, "description": "Entitled to a nice debug"}}
-                }
-
-            # YATA api
-            # url = "http://127.0.0.1:8000/api/v1/stocks/alerts/?debug=true"
-            url = "https://yata.yt/api/v1/stocks/alerts/"
-            # req = requests.get(url).json()
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as r:
-                    req = await r.json()
+            # record the stocks selection and compute the alerts
+            response = await self._load_stocks_info()
+            if response is None:
+                return
+            self._record(response)
+            price = self.series.view("price")[-1]
+            shares = self.series.view("shares")[-1]
 
             # set alerts
-            for k, v in req.items():
-                logging.debug(f"[stocks/alerts] {k}: {v}")
-
-                v["id"] = k  # needed for unique key
-                if v in mentions_keys_prev and k != "42":
-                    mentions_keys.append(v)
-                    logging.debug(f"[stocks/alerts] skip {k}: {v}")
+            for stock_id, types in self._evaluate().items():
+                c = self.series.columns.index(stock_id)
+                logging.debug(f"[stocks/alerts] {stock_id}: {types} price {price[c]} shares {shares[c]}")
+
+                # skip if all the alerts of this stock have already been sent
+                fingerprints = set([self._alert_fingerprint(stock_id, t, price[c]) for t in types])
+                alert_keys |= fingerprints
+                if fingerprints <= self.alert_keys:
+                    logging.debug(f"[stocks/alerts] skip {stock_id}: {fingerprints}")
                     continue
 
-                alerts = v.get("alerts", dict({}))
-
-                title = False
-                if k == "42":
-                    title = f'{stockInfo[k]["name"]}'
-                    description = f'Debug alert'
-
-                if alerts.get("below", False) and alerts.get("forecast", False) and v.get("shares"):
-                    title = f'{stockInfo[k]["name"]}'
-                    description = f'Below average and forecast moved from bad to good'
-
-                if alerts.get("injection", False):
-                    title = f'{stockInfo[k]["name"]}'
+                info = self._stock_info(stock_id)
+                if "injection" in types:
                     description = f'New shares have been injected by the system'
+                else:
+                    description = f'Below average and forecast moved from bad to good'
 
-                if title:
-                    # Title and description
-                    embed = Embed(title=title, description=f"[{description}](https://www.torn.com/stockexchange.php)")
-
-                    # stock price and shares
-                    # embed.add_field(name='Code', value=f'{k}')
-                    embed.add_field(name='Shares', value=f'{v["shares"]:,.0f}')
-                    embed.add_field(name='Share price', value=f'${v["price"]:,.2f}')
+                # Title and description
+                embed = Embed(title=f'{info.name}', description=f"[{description}](https://www.torn.com/stockexchange.php)")
 
-                    # Block
-                    n = stockInfo[k]["benefit"]["requirement"]
-                    price = n * float(v["price"])
-                    embed.add_field(name='Block description', value=f'{stockInfo[k]["benefit"]["description"]}')
-                    embed.add_field(name='Block requirement', value=f'{n:,.0f} shares')
-                    embed.add_field(name='Block Price', value=f'${price:,.0f}')
+                # stock price and shares
+                embed.add_field(name='Shares', value=f'{shares[c]:,.0f}')
+                embed.add_field(name='Share price', value=f'${price[c]:,.2f}')
 
-                    # # graph
-                    # lst = plot_stocks(v["graph"])
-                    # embed.add_field(name="Prices", value="\n".join(lst))
+                # Block
+                n = info.requirement
+                block = n * float(price[c])
+                embed.add_field(name='Block description', value=f'{info.description}')
+                embed.add_field(name='Block requirement', value=f'{n:,.0f} shares')
+                embed.add_field(name='Block Price', value=f'${block:,.0f}')
 
-                    # thumbnail
-                    embed.set_thumbnail(url=f'https://yata.yt/media/stocks/{stockInfo[k]["id"]}.png')
-                    mentions.append(embed)
-                    if k != "42":
-                        mentions_keys.append(v)
+                # thumbnail
+                embed.set_thumbnail(url=f'https://yata.yt/media/stocks/{info.id}.png')
+                mentions.append(embed)
 
-            await push_data(self.bot.bot_id, ts_now(), mentions_keys, "stocks")
+            # persist only if alerts have been added or expired
+            added = alert_keys - self.alert_keys
+            expired = self.alert_keys - alert_keys
+            if len(added) or len(expired):
+                logging.debug(f"[stocks/alerts] push alerts: {len(added)} added {len(expired)} expired")
+                await push_data(self.bot.bot_id, ts_now(), sorted(alert_keys), "stocks")
+                self.alert_keys = alert_keys
 
             # create message to send
             if not len(mentions):
@@ -278,11 +430,14 @@ class Stocks(commands.Cog):
                 return
 
         except BaseException as e:
-            logging.error("[stocks/alerts] error on stock notification (YATA CALL)")
-            headers = {"error": "error on stock notification (YATA CALL)"}
+            logging.error(f"[stocks/alerts] error on stock notification: {hide_key(e)}")
+            headers = {"error": "error on stock notification (API CALL)"}
             await self.bot.send_log_main(e, headers=headers)
             return
 
+        # shortened and serialized once for all guilds
+        payloads = [embed_payload(m) for m in mentions]
+
         # loop over guilds to send alerts
         for guild in self.bot.get_guilds_by_module("stocks"):
             try:
@@ -301,9 +456,9 @@ class Stocks(commands.Cog):
 
                 s = "" if len(mentions) == 1 else "s"
                 txt = f"{len(mentions)} stock alert{s}!" if role is None else f"{role.mention}, {len(mentions)} stock alert{s}!"
-                await send(channel, txt, embed=mentions[0])
-                for embed in mentions[1:]:
-                    await send(channel, embed=embed)
+                await send_payload(self.bot, channel, txt, payloads[0])
+                for payload in payloads[1:]:
+                    await send_payload(self.bot, channel, '', payload)
 
             except BaseException as e:
                 logging.error(f"[stocks/alerts] {guild} [{guild.id}]: {hide_key(e)}")
@@ -22,6 +22,9 @@ import aiohttp
 import asyncio
 import html
 import traceback
+import hashlib
+import itertools
+import json
 import logging
 
 # import discord modules
@@ -30,16 +33,45 @@ from discord.abc import PrivateChannel
 from discord.utils import get
 from discord.ext import tasks
 from discord import Embed
+from discord import Forbidden
 
 # import bot functions and classes
 from inc.yata_db import set_configuration
 from inc.yata_db import get_faction_name
+from inc.yata_db import get_verify_states
+from inc.yata_db import set_verify_states
+from inc.yata_db import get_verify_jobs
+from inc.yata_db import set_verify_job
 from inc.handy import *
+from inc.progress import ProgressReporter
+
+# members not verified for this number of seconds are verified again by incremental runs
+VERIFY_STALE = 7 * 24 * 3600
+
+# guilds verified or checked at the same time by the schedulers
+VERIFY_CONCURRENCY = 4
+
+# members processed between two checkpoints of a verification job
+JOB_CHECKPOINT = 50
 
 
 class Verify(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+
+        # compiled role plans of the guilds (see _role_plan)
+        self.role_plans = {}
+
+        # scheduled verifications and checks running in the background
+        # key: (option, guild id), value: task
+        self.running = {}
+        self.guilds_semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+        # verification jobs (type verify or check) running or paused
+        # key: (guild id, type)
+        self.jobs = {}
+        self.running[("resume_jobs", 0)] = asyncio.ensure_future(self._resume_jobs())
+
         self.dailyVerify.start()
         self.weeklyVerify.start()
         self.dailyCheck.start()
@@ -50,6 +82,24 @@ class Verify(commands.Cog):
         self.weeklyVerify.cancel()
         self.weeklyCheck.cancel()
         self.dailyCheck.cancel()
+        for task in list(self.running.values()):
+            task.cancel()
+
+    @commands.Cog.listener()
+    async def on_configuration_update(self, guild):
+        self.role_plans.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.role_plans.pop(role.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.role_plans.pop(role.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        self.role_plans.pop(after.guild.id, None)
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -79,7 +129,7 @@ class Verify(commands.Cog):
         role = self.bot.get_module_role(member.guild.roles, config.get("roles_verified", {}))
         if role is None:
             return
-        message, success = await self._member(member, role, discordID=member.id, API_KEY=key, context=False)
+        message, success, _ = await self._member(member, role, discordID=member.id, API_KEY=key, context=False)
 
         # send message to welcome channel
         eb = Embed(color=my_green if success else my_red)
@@ -163,11 +213,11 @@ class Verify(commands.Cog):
                 userID = int(args[0])
                 logging.debug(f'[verify/verify] {ctx.guild}: user ID {userID}')
 
-                message, success = await self._member(ctx, role, userID=userID, API_KEY=key, tag=tag)
+                message, success, _ = await self._member(ctx, role, userID=userID, API_KEY=key, tag=tag)
 
                 # try with discord ID instead of torn ID
                 if not success and get(ctx.guild.members, id=int(userID)):
-                    message, success = await self._member(ctx, role, discordID=userID, API_KEY=key, tag=tag)
+                    message, success, _ = await self._member(ctx, role, discordID=userID, API_KEY=key, tag=tag)
 
 
             # check if arg is a mention of a discord user ID
@@ -176,7 +226,7 @@ class Verify(commands.Cog):
 
                 if len(discordID) and discordID[0].isdigit():
                     logging.debug(f'[verify/verify] {ctx.guild}: discord ID {discordID[0]}')
-                    message, success = await self._member(ctx, role, discordID=discordID[0], API_KEY=key, tag=tag)
+                    message, success, _ = await self._member(ctx, role, discordID=discordID[0], API_KEY=key, tag=tag)
                 else:
                     logging.debug(f'[verify/verify] {ctx.guild}: discord ID unreadable {discordID}')
                     message = f"Could not find discord ID in mention {args[0]}... Either I'm stupid or somthing very wrong is going on."
@@ -187,7 +237,7 @@ class Verify(commands.Cog):
                 success = False
 
         else:  # no args
-            message, success = await self._member(ctx, role, API_KEY=key, tag=tag)
+            message, success, _ = await self._member(ctx, role, API_KEY=key, tag=tag)
 
         eb = Embed(title=f'Verification {"succeeded" if success else "failed"}', description=message, color=my_green if success else my_red)
         eb.set_author(name=ctx.author.display_name, icon_url=ctx.author.avatar_url)
@@ -212,7 +262,8 @@ class Verify(commands.Cog):
 
         force = True if len(args) and args[0] == "force" else False
 
-        await self._loop_verify(ctx.guild, ctx.channel, ctx=ctx, force=force)
+        if not await self._job(ctx.guild, "verify", ctx.channel, {"force": force}):
+            await self.bot.send_error_message(ctx.channel, "A verification is already running or paused on this server (see `!job`)")
 
     @commands.command(aliases=["checkfactions"])
     @commands.bot_has_permissions(send_messages=True, manage_nicknames=True, manage_roles=True)
@@ -232,11 +283,153 @@ class Verify(commands.Cog):
 
         force = True if len(args) and args[0] == "force" else False
 
-        await self._loop_check(ctx.guild, ctx.channel, ctx=ctx, force=force)
+        if not await self._job(ctx.guild, "check", ctx.channel, {"force": force}):
+            await self.bot.send_error_message(ctx.channel, "A faction check is already running or paused on this server (see `!job`)")
+
+    @commands.command()
+    @commands.bot_has_permissions(send_messages=True)
+    @commands.guild_only()
+    async def job(self, ctx, *args):
+        """ Status, pause, resume or cancel the verification jobs: !job [pause|resume|cancel verify|check]"""
+        logging.info(f'[verify/job] {ctx.guild}: {ctx.author} / {args}')
+
+        # check if admin channel
+        if not await self.bot.check_channel_admin(ctx):
+            return
+
+        if not len(args):
+            lst = []
+            for type in ["verify", "check"]:
+                job = self.jobs.get((ctx.guild.id, type))
+                if job is None:
+                    lst.append(f'**{type}**: no job')
+                else:
+                    lst.append(f'**{type}**: {job["status"]} since {ts_to_datetime(job["started"], fmt="short")} ({job["done"]} members done, options {job["options"]})')
+            eb = Embed(title=f'Verification jobs of {ctx.guild}', description="\n".join(lst), color=my_blue)
+            await send(ctx, embed=eb)
+            return
+
+        if len(args) < 2 or args[0] not in ["pause", "resume", "cancel"] or args[1] not in ["verify", "check"]:
+            await self.bot.send_help_message(ctx.channel, "Use `!job` for the status or `!job pause|resume|cancel verify|check`")
+            return
+
+        action, type = args[0], args[1]
+        job = self.jobs.get((ctx.guild.id, type))
+        if job is None:
+            await self.bot.send_error_message(ctx.channel, f"No {type} job on this server")
+            return
+
+        if action == "pause" and job["status"] == "running":
+            job["status"] = "paused"
+        elif action == "resume" and job["status"] == "paused":
+            # the job stays registered until _job takes it over
+            job["status"] = "resuming"
+            self.running[(f'job_{type}', ctx.guild.id)] = asyncio.ensure_future(self._resume_job(ctx.guild, type, ctx.channel))
+        elif action == "cancel":
+            status = job["status"]
+            job["status"] = "cancelled"
+            if status in ["paused", "resuming"]:
+                self.jobs.pop((ctx.guild.id, type))
+                await self._save_job(job)
+        else:
+            await self.bot.send_error_message(ctx.channel, f"Can't {action} a {job['status']} {type} job")
+            return
+
+        await send(ctx, embed=Embed(description=f'{type} job: {action}', color=my_green))
+
+    async def _save_job(self, job):
+        await set_verify_job(self.bot.bot_id, job["guild_id"], job["type"], job["status"], job["cursor"], json.dumps(job["options"]), job["channel_id"], job["started"], ts_now())
+
+    async def _job(self, guild, type, channel, options=None, resume=False):
+        """ verifies (type verify) or checks (type check) all the members as a persistent job
+            - the cursor (last member processed) is saved every JOB_CHECKPOINT members
+            - only one job per guild and type
+            - resume=True takes over the job registered with the status resuming (options, cursor and start kept)
+            returns False if a job of the same type is already running or paused (or no job to resume)
+        """
+        key = (guild.id, type)
+        if resume:
+            job = self.jobs.get(key)
+            if job is None or job["status"] != "resuming":
+                return False
+            job["status"] = "running"
+            job["channel_id"] = channel.id
+            options = job["options"]
+
+        elif key in self.jobs:
+            return False
+
+        else:
+            job = {"guild_id": guild.id, "type": type, "status": "running", "cursor": "", "options": options, "channel_id": channel.id, "started": ts_now(), "done": 0}
+            self.jobs[key] = job
+
+        await self._save_job(job)
+
+        try:
+            if type == "verify":
+                await self._loop_verify(guild, channel, job=job, **options)
+            else:
+                await self._loop_check(guild, channel, job=job, **options)
+            if job["status"] == "running":
+                job["status"] = "done"
+
+        except asyncio.CancelledError:
+            # the bot is stopping: keep the job running to resume it
+            raise
+
+        except BaseException:
+            job["status"] = "failed"
+            raise
+
+        finally:
+            if job["status"] != "paused":
+                self.jobs.pop(key, None)
+            if job["status"] != "running":
+                await self._save_job(job)
+
+        return True
+
+    async def _resume_job(self, guild, type, channel):
+        try:
+            async with self.guilds_semaphore:
+                logging.info(f'[verify/_resume_job] {guild}: resume {type} job')
+                if not await self._job(guild, type, channel, resume=True):
+                    logging.info(f'[verify/_resume_job] {guild}: {type} job cancelled before resuming')
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            logging.error(f'[verify/_resume_job] {guild} [{guild.id}]: {hide_key(e)}')
+            headers = {"guild": guild, "guild_id": guild.id, "error": f"error on {type} job"}
+            await self.bot.send_log_main(e, headers=headers, full=True)
+        finally:
+            self.running.pop((f'job_{type}', guild.id), None)
+
+    async def _resume_jobs(self):
+        """ resumes the jobs interrupted by a restart (paused jobs wait for !job resume)
+        """
+        try:
+            await self.bot.wait_until_ready()
+            for r in await get_verify_jobs(self.bot.bot_id):
+                guild = self.bot.get_guild(r["guild_id"])
+                channel = None if guild is None else guild.get_channel(r["channel_id"])
+                job = {"guild_id": r["guild_id"], "type": r["type"], "status": r["status"], "cursor": r["cursor"], "options": json.loads(r["options"]), "channel_id": r["channel_id"], "started": r["started"], "done": 0}
+                if channel is None:
+                    job["status"] = "cancelled"
+                    await self._save_job(job)
+                elif job["status"] == "paused":
+                    self.jobs[(guild.id, job["type"])] = job
+                else:
+                    job["status"] = "resuming"
+                    self.jobs[(guild.id, job["type"])] = job
+                    self.running[(f'job_{job["type"]}', guild.id)] = asyncio.ensure_future(self._resume_job(guild, job["type"], channel))
+        except BaseException as e:
+            logging.error(f'[verify/_resume_jobs] {hide_key(e)}')
+        finally:
+            self.running.pop(("resume_jobs", 0), None)
 
     async def _member(self, ctx, verified_role, userID=None, discordID=None, API_KEY="", context=True, tag=False):
         """ Verifies one member
-            Returns what the bot should say
+            Returns what the bot should say, if it succeeded and if the member was edited
         """
         try:
 
@@ -268,28 +461,26 @@ class Verify(commands.Cog):
             # boolean that check if the member is verifying himself with no id given
             author_verif = userID is None and discordID is None
             # logging.debug(f"[verify/_member] author_verif {author_verif}")
-            # case no userID and no discordID is given (author verify itself)
-            if author_verif:
-                author = ctx.author
-                response, e = await self.bot.api_call("user", author.id, ["discord"], API_KEY)
-                if e and "error" in response:
-                    return f'API error code {response["error"]["code"]}: {response["error"]["error"]}', False
-
-                userID = response['discord'].get("userID")
-                if userID == '':
-                    return f"{author}, you are not officially verified by Torn", False
-
-            # case discordID is given
+            # discord id to resolve: author (no userID and no discordID given) or discordID
             # if discordID is not None and userID is None:  # use this condition to skip API call if userID is given
-            if discordID is not None:  # use this condition to force API call to check userID even if it is given
-                response, e = await self.bot.api_call("user", discordID, ["discord"], API_KEY)
-                if e and "error" in response:
-                    return f'API error code {response["error"]["code"]}: {response["error"]["error"]}', False
-
-                if response['discord'].get("userID") == '':
-                    return f"{guild.get_member(discordID)} is not officially verified by Torn", False
+            lookupID = ctx.author.id if author_verif else discordID  # resolve discordID even if userID is given
+            if lookupID is not None:
+                # identity cache first
+                cachedID = await self.bot.get_identity(lookupID)
+                if cachedID is not None:
+                    userID = cachedID
                 else:
-                    userID = int(response['discord'].get("userID"))
+                    response, e = await self.bot.api_call("user", lookupID, ["discord"], API_KEY)
+                    if e and "error" in response:
+                        return f'API error code {response["error"]["code"]}: {response["error"]["error"]}', False, False
+
+                    if response['discord'].get("userID") == '':
+                        await self.bot.confirm_identity(lookupID, None)
+                        if author_verif:
+                            return f"{ctx.author}, you are not officially verified by Torn", False, False
+                        return f"{guild.get_member(discordID)} is not officially verified by Torn", False, False
+                    else:
+                        userID = int(response['discord'].get("userID"))
 
             logging.info(f"[verify/_member] verifying userID = {userID}")
 
@@ -297,80 +488,105 @@ class Verify(commands.Cog):
             response, e = await self.bot.api_call("user", userID, ["profile", "discord"], API_KEY)
             if e and "error" in response:
                 if int(response["error"]["code"]) == 6:
-                    return f"Torn ID {userID} is not known. Please check again.", False
+                    return f"Torn ID {userID} is not known. Please check again.", False, False
                 else:
-                    return f'API error code {response["error"]["code"]}: {response["error"]["error"]}', False
+                    return f'API error code {response["error"]["code"]}: {response["error"]["error"]}', False, False
 
             # check != id shouldn't append or problem in torn API
             dis = response.get("discord")
             if int(dis.get("userID")) != userID:
-                return f'That\'s odd... {userID} != {dis.get("userID")}', False
+                return f'That\'s odd... {userID} != {dis.get("userID")}', False, False
 
             # check if registered in torn discord
             discordID = None if dis.get("discordID") in [''] else int(dis.get("discordID"))
             name = response.get("name", "???")
-            nickname = f'{name}'
-            add_ID = not config.get("other", {}).get("disable_id", False)
-            if add_ID:
-                nickname += f' [{userID}]'
-            if tag:
-                tag_str = f"{'' if add_ID else ' '}[{tag}]"
-                nickname += tag_str
+            nickname = self._nickname(config, name, userID, tag)
+
+            # identity from the cache changed on torn side
+            if lookupID is not None and discordID != int(lookupID):
+                await self.bot.confirm_identity(lookupID, None)
+                return f"The Torn account linked to this discord account changed. Please verify again.", False, False
 
             if discordID is None:
                 # the guy did not log into torn discord
-                return f"{nickname} is not officially verified by Torn", False
+                return f"{nickname} is not officially verified by Torn", False, False
+
+            # identity confirmed by the profile
+            await self.bot.confirm_identity(discordID, userID)
 
             # the guy already log in torn discord
             member = ctx.author if author_verif else get(ctx.guild.members, id=discordID)
             if member is None:
-                return f"You are trying to verify {nickname} but they didn't join this server... Maybe they are using a different discord account on the official Torn discord server.", False
+                return f"You are trying to verify {nickname} but they didn't join this server... Maybe they are using a different discord account on the official Torn discord server.", False, False
 
-            logging.debug(f'[verify/_member] {ctx.guild}: {member} nickname={nickname}, add_id={add_ID}, tag={tag}')
-            try:
-                await member.edit(nick=nickname)
-            except BaseException as e:
-                logging.debug(f"[verify/_member] {ctx.guild}: {member} can't edit nickname: {e}")
-                channel = self.bot.get_guild_admin_channel(ctx.guild)
-                if channel is not None:
-                    await self.bot.send_error_message(channel, f"Can't edit {member}'s nickname to **{nickname}**\n`{e}`")
-                pass
-
-            # Get faction id and name
+            # Get faction id, name and position
             faction_id = str(response['faction']['faction_id'])
             faction_name = html.unescape(str(response['faction']['faction_name']))
-
-            # get all faction and position roles
-            all_position_roles_id = list(set([role_id for faction_id, positions  in config.get("positions", {}).items() for _ in positions.values() for role_id in _]))
-            all_position_roles = [r for r in self.bot.get_module_role(ctx.guild.roles, all_position_roles_id, all=True) if r is not None]
-            all_faction_roles_id = list(set([role_id for faction_id, roles  in config.get("factions", {}).items() for role_id in roles]))
-            all_faction_roles = [r for r in self.bot.get_module_role(ctx.guild.roles, all_faction_roles_id, all=True) if r is not None]
-            all_roles_possible = list(set(all_faction_roles + all_position_roles))
-
-            # get roles to add
             member_position = f'{html.unescape(response.get("faction", {}).get("position"))}'
-            faction_roles_to_add = [r for r in all_roles_possible if str(r.id) in config.get("factions", {}).get(faction_id, {})]
-            position_roles_to_add = [r for r in all_roles_possible if str(r.id) in config.get("positions", {}).get(faction_id, {}).get(member_position, {})]
-            all_roles_to_add = [r for r in list(set(faction_roles_to_add + position_roles_to_add))]
 
-            # deduce all role to remove
-            all_roles_to_remove = [r for r in member.roles if r in all_roles_possible and r not in all_roles_to_add]
+            return await self._apply_member(guild, member, verified_role, config, userID, name, faction_id, faction_name, member_position, tag=tag, author_verif=author_verif)
 
-            # clean roles
-            await member.remove_roles(*all_roles_to_remove)
+        except BaseException as e:
+            logging.error(f'[verify/_member] {guild} [{guild.id}]: {hide_key(e)}')
+            await self.bot.send_log_main(e, full=True)
+            return f"Error while doing the verification: {hide_key(e)}", False, False
 
-            # add roles (add verified role and clean already given roles)
-            all_roles_to_actually_add = [r for r in all_roles_to_add + [verified_role] if r not in member.roles]
-            await member.add_roles(*all_roles_to_actually_add)
+        return "< error > Weird... I didn't do anything...", False, False
 
-            # print("all_roles_possible", all_roles_possible)
-            # print("all_faction_roles", all_faction_roles)
-            # print("all_position_roles", all_position_roles)
-            # print("faction_roles_to_add", faction_roles_to_add)
-            # print("position_roles_to_add", position_roles_to_add)
-            # print("all_roles_to_remove", all_roles_to_remove)
-            # print("all_roles_to_add", all_roles_to_add)
-            # print("all_roles_to_actually_add", all_roles_to_actually_add)
+    def _nickname(self, config, name, userID, tag=False):
+        """ nickname of a verified member: name [id] [tag]
+        """
+        nickname = f'{name}'
+        add_ID = not config.get("other", {}).get("disable_id", False)
+        if add_ID:
+            nickname += f' [{userID}]'
+        if tag:
+            tag_str = f"{'' if add_ID else ' '}[{tag}]"
+            nickname += tag_str
+        return nickname
+
+    async def _apply_member(self, guild, member, verified_role, config, userID, name, faction_id, faction_name, member_position, tag=False, author_verif=False):
+        """ Sets the nickname and the roles of a member whose torn identity is known
+            Returns what the bot should say, if it succeeded and if the member was edited
+        """
+        try:
+            nickname = self._nickname(config, name, userID, tag)
+            logging.debug(f'[verify/_apply_member] {guild}: {member} nickname={nickname}, tag={tag}')
+
+            # get final roles from the role plan
+            plan = self._role_plan(guild, config)
+            faction_roles_id = plan["factions"].get(faction_id, set())
+            position_roles_id = plan["positions"].get((faction_id, member_position), set())
+            member_roles_id = set([r.id for r in member.roles]) - set([guild.default_role.id])
+            roles_id = (member_roles_id - plan["possible"]) | faction_roles_id | position_roles_id | set([verified_role.id])
+            faction_roles_to_add = [guild.get_role(id) for id in faction_roles_id]
+            position_roles_to_add = [guild.get_role(id) for id in position_roles_id]
+
+            # the nickname of the owner and of the members above the bot can't be changed
+            can_nick = member.id != guild.owner_id and member.top_role < guild.me.top_role
+            if member.display_name != nickname and not can_nick:
+                logging.debug(f"[verify/_apply_member] {guild}: {member} can't edit nickname (owner or above the bot)")
+
+            # apply nickname and roles in one request (nothing if already up to date)
+            changes = {}
+            if member.display_name != nickname and can_nick:
+                changes["nick"] = nickname
+            if roles_id != member_roles_id:
+                changes["roles"] = [guild.get_role(id) for id in roles_id]
+
+            if not len(changes):
+                logging.debug(f'[verify/_apply_member] {guild}: {member} already up to date')
+            else:
+                try:
+                    await member.edit(**changes)
+                except Forbidden as e:
+                    # the nickname is checked above so it's the roles (above the bot in the hierarchy)
+                    what = "roles" if "roles" in changes else "nickname"
+                    logging.debug(f"[verify/_apply_member] {guild}: {member} can't edit {what}: {e}")
+                    channel = self.bot.get_guild_admin_channel(guild)
+                    if channel is not None:
+                        await self.bot.send_error_message(channel, f"Can't edit {member}'s {what} (check the bot role position)\n`{e}`")
+                    return f"Can't edit {member}'s {what}: {e}", False, False
 
             # create role list
             roles_list = [f'**@{html.unescape(verified_role.name)}** (verified role)']
@@ -379,16 +595,124 @@ class Verify(commands.Cog):
 
             nl = '\n'
             str1, str2 = (", you", "You") if author_verif else ("", "They")
-            return f'{member}{str1} have been verified and are now known as **{member.display_name}**.\n{str2} have been given the role{"s" if len(roles_list)>1 else ""}:{nl}{nl.join(roles_list)}', True
+            return f'{member}{str1} have been verified and are now known as **{changes.get("nick", member.display_name)}**.\n{str2} have been given the role{"s" if len(roles_list)>1 else ""}:{nl}{nl.join(roles_list)}', True, len(changes) > 0
 
         except BaseException as e:
-            logging.error(f'[verify/_member] {guild} [{guild.id}]: {hide_key(e)}')
+            logging.error(f'[verify/_apply_member] {guild} [{guild.id}]: {hide_key(e)}')
             await self.bot.send_log_main(e, full=True)
-            return f"Error while doing the verification: {hide_key(e)}", False
+            return f"Error while doing the verification: {hide_key(e)}", False, False
+
+    async def _rosters(self, guild, config, keys):
+        """ members of the factions of the server from their basic selection (keys is an iterator over the admin keys)
+            Returns {torn id: (torn id, name, faction id, faction name, position)}
+        """
+        rosters = {}
+        for faction_id in config.get("factions", {}):
+            response, e = await self.bot.api_call("faction", faction_id, ["basic"], next(keys))
+            if e:
+                logging.warning(f'[verify/_rosters] {guild}: faction {faction_id} API error {response["error"]["error"]}')
+                continue
+
+            faction_name = html.unescape(str(response.get("name", faction_id)))
+            for tId, m in response.get("members", {}).items():
+                position = m.get("position")
+                rosters[int(tId)] = (int(tId), m.get("name"), str(faction_id), faction_name, None if position is None else html.unescape(str(position)))
+
+        logging.debug(f'[verify/_rosters] {guild}: {len(rosters)} members in {len(config.get("factions", {}))} factions')
+        return rosters
+
+    async def _roster_match(self, member, verified_role, rosters, key):
+        """ roster entry of an already verified member whose torn id is confirmed by the identity cache
+            or by a single discord selection call on a cache miss
+            (the nickname is user editable and only used as a hint)
+            Returns None if the member needs to be verified with the API
+        """
+        if verified_role not in member.roles:
+            return None
 
-        return "< error > Weird... I didn't do anything...", False
+        torn_id = await self.bot.get_identity(member.id)
+        if torn_id is None:
+            response, e = await self.bot.api_call("user", member.id, ["discord"], key)
+            if e and "error" in response:
+                return None
+            torn_id = response.get("discord", {}).get("userID")
+            if not str(torn_id).isdigit():
+                return None
+            torn_id = int(torn_id)
+            await self.bot.confirm_identity(member.id, torn_id)
+
+        hint = self.bot.members_index.torn_id(member)
+        if hint is not None and hint != torn_id:
+            logging.debug(f'[verify/_roster_match] {member.guild}: {member} nickname id [{hint}] does not match their identity [{torn_id}]')
+
+        entry = rosters.get(torn_id)
+        if entry is None or entry[4] is None:
+            return None
+
+        return entry
+
+    def _role_plan(self, guild, config):
+        """ verify configuration of a guild compiled into role id sets
+            (cached until the configuration is synchronized or a role changes)
+            - factions: {faction id: role ids}
+            - positions: {(faction id, position): role ids}
+            - possible: all faction and position role ids
+        """
+        plan = self.role_plans.get(guild.id)
+        if plan is None:
+            existing = set([r.id for r in guild.roles])
+            factions = {faction_id: set([int(id) for id in roles if str(id).isdigit()]) & existing for faction_id, roles in config.get("factions", {}).items()}
+            positions = {(faction_id, position): set([int(id) for id in roles if str(id).isdigit()]) & existing for faction_id, p in config.get("positions", {}).items() for position, roles in p.items()}
+            possible = set([id for roles in list(factions.values()) + list(positions.values()) for id in roles])
+            plan = {"factions": factions, "positions": positions, "possible": possible}
+            self.role_plans[guild.id] = plan
+            logging.debug(f'[verify/_role_plan] {guild}: {len(factions)} factions {len(positions)} positions {len(possible)} roles')
+        return plan
+
+    def _managed_roles(self, guild, config, verified_role):
+        """ ids of the roles given by the verification (verified, faction and position roles)
+        """
+        return self._role_plan(guild, config)["possible"] | set([verified_role.id])
 
-    async def _loop_verify(self, guild, channel, ctx=False, force=False):
+    def _roles_hash(self, role_ids):
+        return hashlib.blake2b(",".join([str(id) for id in sorted(role_ids)]).encode(), digest_size=8).hexdigest()
+
+    def _verify_state(self, guild, config, verified_role, member, entry, success, torn_id, managed):
+        """ state of a member after verification (expected roles and nickname as the cache is updated later)
+        """
+        if entry is not None:
+            faction_id, position = int(entry[2]), entry[4]
+            nickname = self._nickname(config, entry[1], entry[0])
+            plan = self._role_plan(guild, config)
+            roles = set([verified_role.id]) | plan["factions"].get(entry[2], set()) | plan["positions"].get((entry[2], entry[4]), set())
+        elif success:
+            faction_id, position, nickname = 0, None, None
+            roles = set([verified_role.id])
+        else:
+            faction_id, position, nickname = 0, None, member.display_name
+            roles = set([r.id for r in member.roles])
+        return (guild.id, member.id, torn_id, faction_id, position, nickname, self._roles_hash(roles & managed), ts_now())
+
+    def _verify_changed(self, member, state, rosters, managed):
+        """ checks if a member needs to be verified again since the last verification
+            - new member, nickname or roles changed, stale state
+            - faction or position changed in the rosters
+        """
+        if state is None:
+            return True
+        if ts_now() - state["verified_at"] > VERIFY_STALE:
+            return True
+        if state["nickname"] is not None and state["nickname"] != member.display_name:
+            return True
+        if state["roles_hash"] != self._roles_hash(set([r.id for r in member.roles]) & managed):
+            return True
+
+        entry = rosters.get(state["torn_id"])
+        if entry is None:
+            return state["faction_id"] != 0
+        return int(entry[2]) != state["faction_id"] or (entry[4] is not None and entry[4] != state["position"])
+
+    async def _loop_verify(self, guild, channel, ctx=False, force=False, incremental=False, job=None):
 
         # get configuration
         config = self.bot.get_guild_configuration_by_module(guild, "verify")
@@ -401,53 +725,83 @@ class Verify(commands.Cog):
             await self.bot.send_error_message(channel, f'No verified roles set', title="Error on server members verification")
             return
 
-        eb = Embed(title=f'Verifying all members of {guild}', color=my_blue)
-        eb.add_field(name="Force", value=force)
-        eb.add_field(name="Verified role", value=f'@{role}')
-        await channel.send(embed=eb)
-
-        # loop over members
-        members = guild.members
+        # get the keys of all the admins (rotated over the API calls)
+        keys = await self.bot.get_master_keys(guild)
+        if not len(keys):
+            await self.bot.send_error_message(channel, f'No master key', title="Error on server members verification")
+            return
+        keys = itertools.cycle(keys)
+
+        # members of the server factions (resolved without individual API calls)
+        rosters = await self._rosters(guild, config, keys)
+
+        # verification states of the last runs
+        states = {r["discord_id"]: r for r in await get_verify_states(guild.id)}
+        managed = self._managed_roles(guild, config, role)
+        updates = []
+        skipped = 0
+
+        # loop over members (sorted by id to resume jobs from their cursor)
+        members = sorted(guild.members, key=lambda m: m.id)
+        cursor = int(job["cursor"]) if job is not None and job["cursor"].isdigit() else 0
+        report = ProgressReporter(channel, f'Verifying all members of {guild}', len(members), fields={"Force": force, "Incremental": incremental, "Verified role": f'@{role}'})
+        await report.start()
         for i, member in enumerate(members):
-            if member.bot:
+            report.update(i + 1)
+            if member.id <= cursor:
                 continue
 
-            # get key
-            status, tornId, key = await self.bot.get_master_key(guild)
-            if status == -1:
-                await self.bot.send_error_message(channel, f'No master key', title="Error on server members verification")
-                return
+            # job checkpoint
+            if job is not None:
+                job["cursor"] = str(members[i - 1].id) if i else job["cursor"]
+                if job["status"] != "running":
+                    break
+                job["done"] += 1
+                if job["done"] % JOB_CHECKPOINT == 0:
+                    await set_verify_states(updates)
+                    updates = []
+                    await self._save_job(job)
 
-            if force:
-                if ctx:
-                    message, success = await self._member(ctx, role, discordID=member.id, API_KEY=key)
-                else:
-                    message, success = await self._member(member, role, discordID=member.id, API_KEY=key, context=False)
+            if member.bot:
+                continue
 
-                if not success:
-                    eb = Embed(description=f'{message}', color=my_green if success else my_red)
-                    eb.set_author(name=f'{member.display_name}', icon_url=member.avatar_url)
-                    eb.set_footer(text=f'{i+1:03d}/{len(members):03d}')
-                    await channel.send(embed=eb)
+            if not force and role in member.roles:
                 continue
 
-            elif role in member.roles:
-                pass
+            # only verify members that changed since the last run
+            state = states.get(member.id)
+            if incremental and not self._verify_changed(member, state, rosters, managed):
+                if state["nickname"] is None:
+                    updates.append(tuple(state[k] for k in ["guild_id", "discord_id", "torn_id", "faction_id", "position"]) + (member.display_name, state["roles_hash"], state["verified_at"]))
+                skipped += 1
+                continue
+
+            roster = await self._roster_match(member, role, rosters, next(keys))
+            if roster is not None:
+                message, success, edited = await self._apply_member(guild, member, role, config, *roster)
+            elif ctx:
+                message, success, edited = await self._member(ctx, role, discordID=member.id, API_KEY=next(keys))
             else:
-                if ctx:
-                    message, success = await self._member(ctx, role, discordID=member.id, API_KEY=key)
-                else:
-                    message, success = await self._member(member, role, discordID=member.id, API_KEY=key, context=False)
+                message, success, edited = await self._member(member, role, discordID=member.id, API_KEY=next(keys), context=False)
 
-                eb = Embed(description=f'{message}', color=my_green if success else my_red)
-                eb.set_author(name=f'{member.display_name}', icon_url=member.avatar_url)
-                eb.set_footer(text=f'{i+1:03d}/{len(members):03d}')
-                await channel.send(embed=eb)
+            torn_id = roster[0] if roster is not None else (await self.bot.get_identity(member.id) if success else None)
+            entry = roster if roster is not None else rosters.get(torn_id)
+            updates.append(self._verify_state(guild, config, role, member, entry, success, 0 if torn_id is None else torn_id, managed))
 
-        eb = Embed(title=f'Done verifying', color=my_blue)
-        await channel.send(embed=eb)
+            # only show failures and changes when forcing
+            if force and success and not edited:
+                continue
+
+            report.add(member.display_name, message, success)
 
-    async def _loop_check(self, guild, channel, ctx=False, force=False):
+        await set_verify_states(updates)
+
+        fields = {"Unchanged": f'{skipped} members'} if incremental else {}
+        if job is not None and job["status"] != "running":
+            fields["Job"] = job["status"]
+        await report.finish(fields=fields)
+
+    async def _loop_check(self, guild, channel, ctx=False, force=False, job=None):
 
         # get configuration
         config = self.bot.get_guild_configuration_by_module(guild, "verify")
@@ -457,15 +811,26 @@ class Verify(commands.Cog):
         # get verified role
         vrole = self.bot.get_module_role(guild.roles, config.get("roles_verified", {}))
 
-        # get unique faction_roles
-        all_faction_roles = [id for faction_id, faction_roles_id in config.get("factions", {}).items() for id in faction_roles_id]
+        # number of factions using each role (to get the unique faction roles)
+        faction_roles_count = {}
+        for faction_roles_id in config.get("factions", {}).values():
+            for id in faction_roles_id:
+                faction_roles_count[id] = faction_roles_count.get(id, 0) + 1
+
+        # cursor of the job: faction id:member id
+        cursor = job["cursor"].split(":") if job is not None and ":" in job["cursor"] else ["0", "0"]
+        cursor_faction, cursor_member = int(cursor[0]), int(cursor[1])
 
-        # loop over factions
-        for faction_id, faction_roles_id in config.get("factions", {}).items():
+        # loop over factions (sorted by id to resume jobs from their cursor)
+        for faction_id, faction_roles_id in sorted(config.get("factions", {}).items(), key=lambda x: int(x[0])):
+            if int(faction_id) < cursor_faction:
+                continue
+            if job is not None and job["status"] != "running":
+                break
 
             # Get faction roles
             faction_roles = [_ for _ in self.bot.get_module_role(guild.roles, faction_roles_id, all=True) if _ is not None]
-            faction_roles_unique = [_ for _ in faction_roles if all_faction_roles.count(str(_.id)) == 1]
+            faction_roles_unique = [_ for _ in faction_roles if faction_roles_count.get(str(_.id)) == 1]
             roles_list = ", ".join([f'@{html.unescape(faction_role.name)}' for faction_role in faction_roles])
             faction_name = await get_faction_name(faction_id)
 
@@ -473,12 +838,6 @@ class Verify(commands.Cog):
                 await self.bot.send_error_message(channel, f'None of the following roles are unique: {roles_list}', title=f"Error checking faction {faction_name}")
                 continue
 
-            eb = Embed(title=f'Checking faction {faction_name}', color=my_blue)
-            eb.add_field(name="Force", value=force)
-            eb.add_field(name="Roles", value=roles_list)
-            eb.add_field(name="Unique role", value=f'@{html.unescape(faction_roles_unique[0].name)}')
-            await channel.send(embed=eb)
-
             # api call with members list from torn
             status, tornIdForKey, key = await self.bot.get_master_key(guild)
             if status == -1:
@@ -494,26 +853,41 @@ class Verify(commands.Cog):
 
             members_torn = response.get("members", dict({}))
 
-            # loop over the members with this role
-            members_with_role = [m for m in guild.members if faction_roles_unique[0] in m.roles]
+            # members with this role from the index
+            members_with_role = [guild.get_member(id) for id in sorted(self.bot.members_index.members_with_role(guild, faction_roles_unique[0]))]
+            members_with_role = [m for m in members_with_role if m is not None]
+
+            # torn ids parsed from the display names and still in the faction
+            torn_ids = {m.id: self.bot.members_index.torn_id(m) for m in members_with_role}
+            torn_ids = {k: v for k, v in torn_ids.items() if v is not None}
+            in_faction = set(torn_ids.values()) & {int(k) for k in members_torn}
+
+            report = ProgressReporter(channel, f'Checking faction {faction_name}', len(members_with_role), fields={"Force": force, "Roles": roles_list, "Unique role": f'@{html.unescape(faction_roles_unique[0].name)}'})
+            await report.start()
             for i, m in enumerate(members_with_role):
-                if m.bot:
+                report.update(i + 1)
+                if int(faction_id) == cursor_faction and m.id <= cursor_member:
                     continue
 
-                # try to parse Torn user ID
-                regex = re.findall(r'\[(\d{1,7})\]', m.display_name)
-                if len(regex) == 1 and regex[0].isdigit():
-                    tornId = int(regex[0])
-                else:
+                # job checkpoint
+                if job is not None:
+                    job["cursor"] = f'{faction_id}:{members_with_role[i - 1].id if i else 0}'
+                    if job["status"] != "running":
+                        break
+                    job["done"] += 1
+                    if job["done"] % JOB_CHECKPOINT == 0:
+                        await self._save_job(job)
 
-                    eb = Embed(description=f'Could not find torn ID within their display name (not checking them)', color=my_red)
-                    eb.set_author(name=f'{m.display_name}', icon_url=m.avatar_url)
-                    eb.set_footer(text=f'{i+1:03d}/{len(members_with_role):03d}')
-                    await channel.send(embed=eb)
+                if m.bot:
+                    continue
+
+                # parsed Torn user ID
+                if m.id not in torn_ids:
+                    report.add(m.display_name, 'Could not find torn ID within their display name (not checking them)', False)
                     continue
 
                 # check if member still in faction
-                if str(tornId) in members_torn:
+                if torn_ids[m.id] in in_faction:
                     # await channel.send(f":white_check_mark: `{m.display_name} still in {faction_role.name}`")
                     continue
                 else:
@@ -521,220 +895,113 @@ class Verify(commands.Cog):
                         for faction_role in faction_roles:
                             await m.remove_roles(faction_role)
 
-                        eb = Embed(description=f'is not part of {html.unescape(faction_name)} anymore: role{"s" if len(faction_roles)>1 else ""} {roles_list} has been removed', color=my_red)
-                        eb.set_author(name=f'{m.display_name}', icon_url=m.avatar_url)
-                        eb.set_footer(text=f'{i+1:03d}/{len(members_with_role):03d}')
-                        await channel.send(embed=eb)
+                        report.add(m.display_name, f'is not part of {html.unescape(faction_name)} anymore: role{"s" if len(faction_roles)>1 else ""} {roles_list} has been removed', False)
 
                         # verify him again see if he has a new faction on the server
                         if ctx:
-                            message, success = await self._member(ctx, vrole, discordID=m.id, API_KEY=key)
+                            message, success, _ = await self._member(ctx, vrole, discordID=m.id, API_KEY=key)
                         else:
-                            message, success = await self._member(m, vrole, discordID=m.id, API_KEY=key, context=False)
-                        eb = Embed(description=f'{message}', color=my_green if success else my_red)
-                        eb.set_author(name=f'{m.display_name}', icon_url=m.avatar_url)
-                        eb.set_footer(text=f'{i+1:03d}/{len(members_with_role):03d}')
-                        await channel.send(embed=eb)
-
+                            message, success, _ = await self._member(m, vrole, discordID=m.id, API_KEY=key, context=False)
+                        report.add(m.display_name, message, success)
 
                     else:
+                        report.add(m.display_name, f'is not part of {html.unescape(faction_name)} anymore.', False)
 
-                        eb = Embed(description=f'is not part of {html.unescape(faction_name)} anymore.', color=my_red)
-                        eb.set_author(name=f'{m.display_name}', icon_url=m.avatar_url)
-                        eb.set_footer(text=f'{i+1:03d}/{len(members_with_role):03d}')
-                        await channel.send(embed=eb)
+            await report.finish()
 
         eb = Embed(title=f'Done checking', color=my_blue)
         await channel.send(embed=eb)
 
-    @tasks.loop(hours=1)
-    async def dailyVerify(self):
-        logging.debug("[verify/dailyVerify] start task")
-
-        # iteration over all guilds
-        async for guild in self.bot.fetch_guilds(limit=250):
-            try:
-                # get configuration
-                config = self.bot.get_guild_configuration_by_module(guild, "verify")
-                if not config:
-                    continue
-
-                # ignore servers with no option daily check
-                if not config.get("other", {}).get("daily_verify", False):
-                    continue
-
-                try:
-                    last_update = int(config["other"]["daily_verify"])
-                except BaseException as e:
-                    logging.error(f'[verify/dailyVerify] Failed to cast last update into int guild {guild}: {config["other"]["daily_verify"]}')
-                    last_update = 1
-                if ts_now() - last_update < 24 * 3600:
-                    continue
+    def _schedule_guilds(self, option, period, type, options):
+        """ starts a job (type verify or check) in the background for the guilds with the option enabled
+            and not run for more than period seconds
+        """
+        for guild in self.bot.guilds:
+            if (option, guild.id) in self.running:
+                continue
 
-                # update time
-                config["other"]["daily_verify"] = ts_now()
-                self.bot.configurations[guild.id]["verify"] = config
-                await set_configuration(self.bot.bot_id, guild.id, guild.name, self.bot.configurations[guild.id])
+            # get configuration
+            config = self.bot.get_guild_configuration_by_module(guild, "verify")
+            if not config:
+                continue
 
-                # get full guild (async iterator doesn't return channels)
-                guild = self.bot.get_guild(guild.id)
-                logging.debug(f"[verify/dailyVerify] verifying all {guild}: start")
-                # get channel
-                channel = self.bot.get_guild_admin_channel(guild)
-                if channel is None:
-                    logging.debug(f"[verify/dailyVerify] {guild}: no admin channel found")
-                    continue
-                await self._loop_verify(guild, channel, force=True)
-                logging.debug(f"[verify/dailyVerify] verifying all {guild}: end")
+            # ignore servers with the option disabled
+            if not config.get("other", {}).get(option, False):
+                continue
 
+            try:
+                last_update = int(config["other"][option])
             except BaseException as e:
-                logging.error(f'[verify/dailyVerify] {guild} [{guild.id}]: {hide_key(e)}')
-                await self.bot.send_log(e, guild_id=guild.id)
-                headers = {"guild": guild, "guild_id": guild.id, "error": "error on daily verify"}
-                await self.bot.send_log_main(e, headers=headers, full=True)
-
-        logging.debug("[verify/dailyVerify] end task")
+                logging.error(f'[verify/{option}] Failed to cast last update into int guild {guild}: {config["other"][option]}')
+                last_update = 1
+            now = ts_now()
+            if now - last_update < period:
+                continue
 
-    @tasks.loop(hours=1)
-    async def weeklyVerify(self):
-        logging.debug("[verify/weeklyVerify] start task")
+            # the scheduling time is persisted (not the start) so the offset and the semaphore wait don't delay the next run
+            self.running[(option, guild.id)] = asyncio.ensure_future(self._run_guild(option, guild, type, options, now))
 
-        # iteration over all guilds
-        async for guild in self.bot.fetch_guilds(limit=250):
-            try:
-                # get configuration
+    async def _run_guild(self, option, guild, type, options, scheduled):
+        try:
+            # spread the guilds over the hour and limit the guilds processed at the same time
+            await asyncio.sleep(guild.id % 3600)
+            async with self.guilds_semaphore:
                 config = self.bot.get_guild_configuration_by_module(guild, "verify")
                 if not config:
-                    continue
+                    return
 
-                # ignore servers with no option weekly check
-                if not config.get("other", {}).get("weekly_verify", False):
-                    continue
-
-                try:
-                    last_update = int(config["other"]["weekly_verify"])
-                except BaseException as e:
-                    logging.error(f'[verify/weeklyVerify] Failed to cast last update into int guild {guild}: {config["other"]["weekly_verify"]}')
-                    last_update = 1
-                if ts_now() - last_update < 7 * 24 * 3600:
-                    continue
+                # a manual job is running or paused: try again next hour
+                if (guild.id, type) in self.jobs:
+                    logging.info(f"[verify/{option}] {guild}: {type} job already {self.jobs[(guild.id, type)]['status']}, skipped")
+                    return
 
                 # update time
-                config["other"]["weekly_verify"] = ts_now()
+                config["other"][option] = scheduled
                 self.bot.configurations[guild.id]["verify"] = config
                 await set_configuration(self.bot.bot_id, guild.id, guild.name, self.bot.configurations[guild.id])
 
-                # get full guild (async iterator doesn't return channels)
-                guild = self.bot.get_guild(guild.id)
-                logging.debug(f"[verify/weeklyVerify] verifying all {guild}: start")
                 # get channel
                 channel = self.bot.get_guild_admin_channel(guild)
                 if channel is None:
-                    continue
-                await self._loop_verify(guild, channel, force=True)
-                logging.debug(f"[verify/weeklyVerify] verifying all {guild}: end")
-
-            except BaseException as e:
-                logging.error(f'[verify/weeklyVerify] {guild} [{guild.id}]: {hide_key(e)}')
-                await self.bot.send_log(e, guild_id=guild.id)
-                headers = {"guild": guild, "guild_id": guild.id, "error": "error on weekly verify"}
-                await self.bot.send_log_main(e, headers=headers, full=True)
+                    logging.debug(f"[verify/{option}] {guild}: no admin channel found")
+                    return
 
-        logging.debug("[verify/weeklyVerify] end task")
+                logging.debug(f"[verify/{option}] {guild}: start")
+                if not await self._job(guild, type, channel, options):
+                    logging.info(f"[verify/{option}] {guild}: {type} job started meanwhile, skipped")
+                logging.debug(f"[verify/{option}] {guild}: end")
 
-    @tasks.loop(hours=1)
-    async def dailyCheck(self):
-        logging.debug("[verify/dailyCheck] start task")
+        except asyncio.CancelledError:
+            raise
 
-        # iteration over all guilds
-        async for guild in self.bot.fetch_guilds(limit=250):
-            try:
-                # get configuration
-                config = self.bot.get_guild_configuration_by_module(guild, "verify")
-                if not config:
-                    continue
-
-                # ignore servers with no option daily check
-                if not config.get("other", {}).get("daily_check", False):
-                    continue
-
-                try:
-                    last_update = int(config["other"]["daily_check"])
-                except BaseException as e:
-                    logging.error(f'[verify/dailyCheck] Failed to cast last update into int guild {guild}: {config["other"]["daily_check"]}')
-                    last_update = 1
-                if ts_now() - last_update < 24 * 3600:
-                    continue
+        except BaseException as e:
+            logging.error(f'[verify/{option}] {guild} [{guild.id}]: {hide_key(e)}')
+            await self.bot.send_log(e, guild_id=guild.id)
+            headers = {"guild": guild, "guild_id": guild.id, "error": f"error on {option.replace('_', ' ')}"}
+            await self.bot.send_log_main(e, headers=headers, full=True)
 
-                # update time
-                config["other"]["daily_check"] = ts_now()
-                self.bot.configurations[guild.id]["verify"] = config
-                await set_configuration(self.bot.bot_id, guild.id, guild.name, self.bot.configurations[guild.id])
+        finally:
+            self.running.pop((option, guild.id), None)
 
-                # get full guild (async iterator doesn't return channels)
-                guild = self.bot.get_guild(guild.id)
-                logging.debug(f"[check/dailyCheck] checking all {guild}: start")
-                # get channel
-                channel = self.bot.get_guild_admin_channel(guild)
-                if channel is None:
-                    continue
-                await self._loop_check(guild, channel, force=True)
-                logging.debug(f"[check/dailyCheck] checking all {guild}: end")
+    @tasks.loop(hours=1)
+    async def dailyVerify(self):
+        logging.debug("[verify/dailyVerify] start task")
+        self._schedule_guilds("daily_verify", 24 * 3600, "verify", {"force": True, "incremental": True})
 
-            except BaseException as e:
-                logging.error(f'[check/dailyCheck] {guild} [{guild.id}]: {hide_key(e)}')
-                await self.bot.send_log(e, guild_id=guild.id)
-                headers = {"guild": guild, "guild_id": guild.id, "error": "error on daily check"}
-                await self.bot.send_log_main(e, headers=headers, full=True)
+    @tasks.loop(hours=1)
+    async def weeklyVerify(self):
+        logging.debug("[verify/weeklyVerify] start task")
+        self._schedule_guilds("weekly_verify", 7 * 24 * 3600, "verify", {"force": True})
 
-        logging.debug("[verify/dailyCheck] end task")
+    @tasks.loop(hours=1)
+    async def dailyCheck(self):
+        logging.debug("[verify/dailyCheck] start task")
+        self._schedule_guilds("daily_check", 24 * 3600, "check", {"force": True})
 
     @tasks.loop(hours=1)
     async def weeklyCheck(self):
         logging.debug("[verify/weeklyCheck] start task")
-
-        # iteration over all guilds
-        async for guild in self.bot.fetch_guilds(limit=250):
-            try:
-                # get configuration
-                config = self.bot.get_guild_configuration_by_module(guild, "verify")
-                if not config:
-                    continue
-
-                # ignore servers with no option weekly check
-                if not config.get("other", {}).get("weekly_check", False):
-                    continue
-
-                try:
-                    last_update = int(config["other"]["weekly_check"])
-                except BaseException as e:
-                    logging.error(f'[verify/weeklyCheck] Failed to cast last update into int guild {guild}: {config["other"]["weekly_check"]}')
-                    last_update = 1
-                if ts_now() - last_update < 7 * 24 * 3600:
-                    continue
-
-                # update time
-                config["other"]["weekly_check"] = ts_now()
-                self.bot.configurations[guild.id]["verify"] = config
-                await set_configuration(self.bot.bot_id, guild.id, guild.name, self.bot.configurations[guild.id])
-
-                # get full guild (async iterator doesn't return channels)
-                guild = self.bot.get_guild(guild.id)
-                logging.debug(f"[check/weeklyCheck] checking all {guild}: start")
-                # get channel
-                channel = self.bot.get_guild_admin_channel(guild)
-                if channel is None:
-                    continue
-                await self._loop_check(guild, channel, force=True)
-                logging.debug(f"[check/weeklyCheck] checking all {guild}: end")
-
-            except BaseException as e:
-                logging.error(f'[check/weeklyCheck] {guild} [{guild.id}]: {hide_key(e)}')
-                await self.bot.send_log(e, guild_id=guild.id)
-                headers = {"guild": guild, "guild_id": guild.id, "error": "error on weekly check"}
-                await self.bot.send_log_main(e, headers=headers, full=True)
-
-        logging.debug("[verify/weeklyCheck] end task")
+        self._schedule_guilds("weekly_check", 7 * 24 * 3600, "check", {"force": True})
 
     @dailyVerify.before_loop
     async def before_dailyVerify(self):
@@ -33,8 +33,6 @@ from discord.ext import tasks
 from discord import Embed
 
 # import bot functions and classes
-from inc.yata_db import get_data
-from inc.yata_db import push_data
 from inc.yata_db import get_faction_name
 from inc.handy import *
 
@@ -42,40 +40,24 @@ from inc.handy import *
 class War(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.warsTask.start()
+        self.bot.territory.subscribe(self.notify, ["war_new", "war_ended", "raid_new", "raid_ended"])
 
     def cog_unload(self):
-        self.warsTask.cancel()
+        self.bot.territory.unsubscribe(self.notify)
 
-    @tasks.loop(minutes=5)
-    async def warsTask(self):
-        logging.debug("[war/notifications] start task")
+    async def notify(self, events, response):
+        logging.debug("[war/notifications] start notifications")
 
-        guild = self.bot.get_guild(self.bot.main_server_id)
-        _, _, key = await self.bot.get_master_key(guild)
-
-        if key is None:
-            logging.error(f"[war/notifications] Error no key found for on main server id {self.bot.main_server_id}")
-            return
-
-        response, e = await self.bot.api_call("torn", "", ["raids", "rackets", "territorywars", "timestamp"], key)
-        if e:
-            logging.error(f"[war/notifications] Error {e}")
-            return
-
-        # get previous data to compare with current api call
-        _, randt_p = get_data(self.bot.bot_id, "wars")
-        wars_p = randt_p.get("territorywars", {})
-        raids_p = randt_p.get("raids", {})
+        # events of the territory poller
+        wars_new = {k: v for event, k, v, _ in events if event == "war_new"}
+        wars_ended = {k: v for event, k, _, v in events if event == "war_ended"}
+        raids_new = {k: v for event, k, v, _ in events if event == "raid_new"}
+        raids_ended = {k: v for event, k, _, v in events if event == "raid_ended"}
 
         mentions = []
 
         # Check for new wars
-        for k, v in response["territorywars"].items():
-            # no new war
-            if k in wars_p:
-                continue
-
+        for k, v in wars_new.items():
             assaulting_faction_id = v["assaulting_faction"]
             assaulting_faction = await get_faction_name(assaulting_faction_id)
             defending_faction_id = v["defending_faction"]
@@ -95,11 +77,7 @@ class War(commands.Cog):
             mentions.append(embed)
 
         # Check for new raids
-        for k, v in response["raids"].items():
-            # no new raid
-            if k in raids_p:
-                continue
-
+        for k, v in raids_new.items():
             assaulting_faction_id = v["assaulting_faction"]
             assaulting_faction = await get_faction_name(assaulting_faction_id)
             defending_faction_id = v["defending_faction"]
@@ -117,11 +95,9 @@ class War(commands.Cog):
             mentions.append(embed)
 
         # Check ended wars
-        for k, v in wars_p.items():
-            # war not over
-            if k in response["territorywars"]:
-                continue
-
+        # territory owners fetched once for all the ended wars
+        territory = await self.bot.territory.get_territory() if len(wars_ended) else {}
+        for k, v in wars_ended.items():
             assaulting_faction_id = v["assaulting_faction"]
             assaulting_faction = await get_faction_name(assaulting_faction_id)
             defending_faction_id = v["defending_faction"]
@@ -131,9 +107,8 @@ class War(commands.Cog):
 
             # get result
             description = ''
-            r_tmp, e = await self.bot.api_call("torn", "", ["territory"], key)
-            if not e:
-                t_faction = r_tmp.get("territory", {}).get(k, {}).get("faction", 0)
+            if k in territory:
+                t_faction = territory[k].get("faction", 0)
                 if t_faction == assaulting_faction_id:
                     description = f"[{html.unescape(assaulting_faction)}](https://www.torn.com/factions.php?step=profile&ID={assaulting_faction_id}) successfully assaulted [{html.unescape(defending_faction)}](https://www.torn.com/factions.php?step=profile&ID={defending_faction_id})"
                 elif t_faction == defending_faction_id:
@@ -154,11 +129,7 @@ class War(commands.Cog):
 
 
         # Check ended raids
-        for k, v in raids_p.items():
-            # raid not over
-            if k in response["raids"]:
-                continue
-
+        for k, v in raids_ended.items():
             assaulting_faction_id = v["assaulting_faction"]
             assaulting_faction = await get_faction_name(assaulting_faction_id)
             defending_faction_id = v["defending_faction"]
@@ -180,9 +151,6 @@ class War(commands.Cog):
 
         logging.debug(f'[war/notifications] mentions: {len(mentions)}')
 
-        logging.debug(f"[war/notifications] push wars")
-        await push_data(self.bot.bot_id, int(response["timestamp"]), response, "wars")
-
         # DEBUG
         # embed = Embed(title="Test Racket")
         # mentions.append(embed)
@@ -191,6 +159,9 @@ class War(commands.Cog):
             logging.debug(f"[war/notifications] no notifications")
             return
 
+        # shortened and serialized once for all guilds
+        payloads = [embed_payload(m) for m in mentions]
+
         # iteration over all guilds
         for guild in self.bot.get_guilds_by_module("wars"):
             try:
@@ -208,15 +179,11 @@ class War(commands.Cog):
                 if channel is None:
                     continue
 
-                for m in mentions:
-                    msg = await send(channel, '' if role is None else f'Wars update {role.mention}', embed=m)
+                for payload in payloads:
+                    await send_payload(self.bot, channel, '' if role is None else f'Wars update {role.mention}', payload)
 
             except BaseException as e:
                 logging.error(f'[war/notifications] {guild} [{guild.id}]: {hide_key(e)}')
                 await self.bot.send_log(f'Error during a war alert: {e}', guild_id=guild.id)
                 headers = {"guild": guild, "guild_id": guild.id, "error": "error on war notifications"}
                 await self.bot.send_log_main(e, headers=headers, full=True)
-
-    @warsTask.before_loop
-    async def before_warsTask(self):
-        await self.bot.wait_until_ready()
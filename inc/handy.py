@@ -25,6 +25,8 @@ import re
 import traceback
 import time
 import textwrap
+import copy
+import logging
 
 # import discord modules
 import discord
@@ -34,66 +36,128 @@ my_blue = 4488859
 my_red = 15544372
 my_green = 4175668
 
-# split message if needed
-async def send(obj, content='', embed=None, delete=False):
-    # message list for delete
-
-    msg_list = []
+# discord limits
+#     +-------------+------------------------+
+#     |    Field    |         Limit          |
+#     +-------------+------------------------+
+#     | title       | 256 characters         |
+#     | description | 2048 characters        |
+#     | fields      | Up to 25 field objects |
+#     | field.name  | 256 characters         |
+#     | field.value | 1024 characters        |
+#     | footer.text | 2048 characters        |
+#     | author.name | 256 characters         |
+#     | total       | 6000 characters        |
+#     +-------------+------------------------+
+EMBED_LIMITS = {"title": 256, "description": 2048, "fields": 25, "field.name": 256, "field.value": 1024, "footer.text": 2048, "author.name": 256, "total": 6000}
+
+
+def shorten(text, width):
+    """ cuts a text to a width (keeps line breaks unlike textwrap.shorten)
+    """
+    text = str(text)
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def embed_length(d):
+    """ number of characters of an embed dict counted by discord
+    """
+    n = len(d.get("title", "")) + len(d.get("description", ""))
+    n += sum([len(f.get("name", "")) + len(f.get("value", "")) for f in d.get("fields", [])])
+    n += len(d.get("footer", {}).get("text", "")) + len(d.get("author", {}).get("name", ""))
+    return n
+
+
+def embed_payload(embed):
+    """ dict of an embed shortened to discord limits
+        the dict can be sent as is to several channels (see send_payload)
+    """
+    d = copy.deepcopy(embed.to_dict())
+    if "title" in d:
+        d["title"] = shorten(d["title"], EMBED_LIMITS["title"])
+    if "description" in d:
+        d["description"] = shorten(d["description"], EMBED_LIMITS["description"])
+    if "fields" in d:
+        d["fields"] = [dict(f, name=shorten(f.get("name", ""), EMBED_LIMITS["field.name"]), value=shorten(f.get("value", ""), EMBED_LIMITS["field.value"])) for f in d["fields"][:EMBED_LIMITS["fields"]]]
+    if "footer" in d:
+        d["footer"]["text"] = shorten(d["footer"].get("text", ""), EMBED_LIMITS["footer.text"])
+    if "author" in d:
+        d["author"]["name"] = shorten(d["author"].get("name", ""), EMBED_LIMITS["author.name"])
+
+    # drop the last fields until the embed fits
+    while embed_length(d) > EMBED_LIMITS["total"] and len(d.get("fields", [])):
+        d["fields"].pop()
+
+    return d
+
+
+async def send_payload(bot, channel, content='', payload=None):
+    """ sends content and an embed payload (see embed_payload) to a channel
+        the payload is not rebuilt so it can be shared between all the channels of a broadcast
+        returns the raw message data (None if discord refused it, eg: missing permissions)
+    """
     try:
-        msg = await obj.send(content, embed=embed)
-        msg_list.append(msg)
-
-    except BaseException as e:
-        if isinstance(e, discord.errors.HTTPException) and e.code == 50035:
-            contents = textwrap.wrap(content, 2000)
-            lcontents = len(contents)
-
-            # empty message with embed
-            if not lcontents:
-                contents = ['']
-                lcontents = 1
-
-            for i, content in enumerate(contents):
-                if i + 1 < lcontents:
-                    msg = await obj.send(content, embed=None)
-                    msg_list.append(msg)
-
-                elif embed is not None:
-
-                    # +-------------+------------------------+
-                    # |    Field    |         Limit          |
-                    # +-------------+------------------------+
-                    # | title       | 256 characters         |
-                    # | description | 2048 characters        |
-                    # | fields      | Up to 25 field objects |
-                    # | field.name  | 256 characters         |
-                    # | field.value | 256 characters         |
-                    # | footer.text | 2048 characters        |
-                    # | author.name | 256 characters         |
-                    # +-------------+------------------------+
-
-                    d = embed.to_dict()
-                    new_embed = Embed(title=textwrap.shorten(d.get("title", ""), width=256),
-                                      description=textwrap.shorten(d.get("description", ""), width=2048),
-                                      color=d.get("color"))
+        return await bot.http.send_message(channel.id, content, embed=payload)
+    except discord.HTTPException as e:
+        logging.warning(f'[handy/send_payload] {getattr(channel, "guild", None)} #{channel}: sending message error: {hide_key(e)}')
+        return None
+
+
+def split_content(content, limit=2000):
+    """ splits a message on line breaks (and on spaces for lines too long) in chunks of at most limit characters
+    """
+    chunks = []
+    current = None
+    for line in str(content).split("\n"):
+        parts = textwrap.wrap(line, limit, replace_whitespace=False, drop_whitespace=False) if len(line) > limit else [line]
+        for part in parts:
+            if current is None:
+                current = part
+            elif len(current) + 1 + len(part) > limit:
+                chunks.append(current)
+                current = part
+            else:
+                current = f'{current}\n{part}'
+    if current:
+        chunks.append(current)
+    return chunks
 
-                    for f in d.get("fields", []):
-                        new_embed.add_field(name=textwrap.shorten(f.get("name", ""), width=256), value=textwrap.shorten(f.get("value", ""), width=1024))
 
-                    if d.get('footer', False):
-                        new_embed.set_footer(text=textwrap.shorten(d["footer"].get("text", ""), width=2048))
+def fit_embed(embed):
+    """ embed shortened to discord limits (the same embed if it already fits)
+    """
+    payload = embed_payload(embed)
+    return embed if payload == embed.to_dict() else Embed.from_dict(payload)
 
-                    if d.get('author', False):
-                        new_embed.set_author(name=textwrap.shorten(d["author"].get("name", ""), width=256), url=d["author"].get("url", ""), icon_url=d["author"].get("icon_url", ""))
 
-                    embed = new_embed if len(new_embed) < 6000 else None
+# split message if needed
+async def send(obj, content='', embed=None, delete=False, embeds=None):
+    """ sends content and embeds split locally to fit discord limits
+        - content is split in messages of 2000 characters
+        - embeds are shortened and sent one per message, the first one with the last content
+          (discord.py 1.x can't send several embeds in one message)
+    """
+
+    # validate content and embeds before the first request
+    contents = split_content(content if content else '')
+    if not len(contents):
+        contents = ['']
+    embeds = [fit_embed(e) for e in ([] if embed is None else [embed]) + list(embeds if embeds is not None else [])]
+
+    messages = [(c, None) for c in contents[:-1]]
+    messages.append((contents[-1], embeds[0] if len(embeds) else None))
+    messages += [('', e) for e in embeds[1:]]
 
-                    msg = await obj.send(content, embed=embed)
-                    msg_list.append(msg)
+    # message list for delete
+    msg_list = []
+    try:
+        for c, e in messages:
+            msg = await obj.send(c, embed=e)
+            msg_list.append(msg)
 
-        else:
-            print(f"Sending message error {e}")
-            return
+    except BaseException as e:
+        logging.warning(f'[handy/send] sending message error: {hide_key(e)}')
+        return
 
     # delete messages
     if delete and isinstance(delete, int):
@@ -0,0 +1,112 @@
+"""
+Copyright 2020 kivou.2000607@gmail.com
+
+This file is part of yata-bot.
+
+    yata is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    any later version.
+
+    yata is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with yata-bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# import standard modules
+import logging
+import re
+
+# torn id in a display name (eg: Kivou [2000607])
+TORN_ID_PATTERN = re.compile(r'\[(\d{1,7})\]')
+
+
+def parse_torn_id(display_name):
+    """ torn id parsed from a display name
+        return None if there is not exactly one id
+    """
+    ids = TORN_ID_PATTERN.findall(display_name)
+    return int(ids[0]) if len(ids) == 1 else None
+
+
+class MemberIndex:
+    """ role id -> member ids and member id -> parsed torn id indexes per guild
+        - built from the member cache on first use of a guild
+        - kept up to date by the bot member and role events
+        - torn ids are parsed again if the display name changed without event (eg: username change)
+    """
+
+    def __init__(self):
+        self.roles = {}  # guild id: {role id: set(member id)}
+        self.torn_ids = {}  # guild id: {member id: (display name, torn id or None)}
+
+    def _build(self, guild):
+        roles = {}
+        torn_ids = {}
+        for member in guild.members:
+            for role in member.roles:
+                roles.setdefault(role.id, set()).add(member.id)
+            torn_ids[member.id] = (member.display_name, parse_torn_id(member.display_name))
+        self.roles[guild.id] = roles
+        self.torn_ids[guild.id] = torn_ids
+        logging.debug(f"[members/index] {guild}: {len(guild.members)} members indexed")
+        return roles
+
+    def _guild(self, guild):
+        roles = self.roles.get(guild.id)
+        return self._build(guild) if roles is None else roles
+
+    def members_with_role(self, guild, role):
+        """ return the set of the ids of the members with the role (do not modify)
+        """
+        return self._guild(guild).get(role.id, set())
+
+    def torn_id(self, member):
+        """ return the torn id parsed from the display name of the member (None if not exactly one id)
+        """
+        self._guild(member.guild)
+        torn_ids = self.torn_ids[member.guild.id]
+        cached = torn_ids.get(member.id)
+        if cached is None or cached[0] != member.display_name:
+            cached = (member.display_name, parse_torn_id(member.display_name))
+            torn_ids[member.id] = cached
+        return cached[1]
+
+    def add_member(self, member):
+        if member.guild.id not in self.roles:
+            return
+        roles = self.roles[member.guild.id]
+        for role in member.roles:
+            roles.setdefault(role.id, set()).add(member.id)
+        self.torn_ids[member.guild.id][member.id] = (member.display_name, parse_torn_id(member.display_name))
+
+    def remove_member(self, member):
+        for members in self.roles.get(member.guild.id, {}).values():
+            members.discard(member.id)
+        self.torn_ids.get(member.guild.id, {}).pop(member.id, None)
+
+    def update_member(self, before, after):
+        if after.guild.id not in self.roles:
+            return
+        if before.display_name != after.display_name:
+            self.torn_ids[after.guild.id][after.id] = (after.display_name, parse_torn_id(after.display_name))
+        if before.roles == after.roles:
+            return
+        roles = self.roles[after.guild.id]
+        roles_before = {role.id for role in before.roles}
+        roles_after = {role.id for role in after.roles}
+        for role_id in roles_before - roles_after:
+            roles.get(role_id, set()).discard(after.id)
+        for role_id in roles_after - roles_before:
+            roles.setdefault(role_id, set()).add(after.id)
+
+    def remove_role(self, role):
+        self.roles.get(role.guild.id, {}).pop(role.id, None)
+
+    def remove_guild(self, guild):
+        self.roles.pop(guild.id, None)
+        self.torn_ids.pop(guild.id, None)
@@ -0,0 +1,114 @@
+"""
+Copyright 2020 kivou.2000607@gmail.com
+
+This file is part of yata-bot.
+
+    yata is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    any later version.
+
+    yata is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with yata-bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# import standard modules
+import asyncio
+import logging
+import time
+
+# import discord modules
+from discord import Embed
+
+# import bot functions and classes
+from inc.handy import *
+
+
+class ProgressReporter:
+    """ reports the progress of a loop over members in a channel
+        - one status message edited in the background at most every `delay` seconds
+        - entries (failures and changes) are collected and sent as a paged summary at the end
+        - update() and add() never wait on discord so the loop is not slowed down
+    """
+
+    def __init__(self, channel, title, total, fields=None, delay=10):
+        self.channel = channel
+        self.title = title
+        self.total = total
+        self.fields = fields if fields is not None else {}
+        self.delay = delay
+        self.done = 0
+        self.entries = []  # (name, message, success)
+        self.message = None
+        self._last = 0
+        self._task = None
+
+    def _status(self, finished=False):
+        eb = Embed(title=self.title, description=f'{"Done" if finished else "In progress"}: {self.done}/{self.total} members', color=my_blue)
+        for k, v in self.fields.items():
+            eb.add_field(name=k, value=v)
+        n_failed = len([_ for _ in self.entries if not _[2]])
+        eb.add_field(name="Reported", value=f'{len(self.entries) - n_failed} changes, {n_failed} failures')
+        eb.set_footer(text=f'Updated {ts_to_datetime(ts_now(), fmt="short")}')
+        return eb
+
+    async def start(self):
+        self._last = time.monotonic()
+        self.message = await send(self.channel, embed=self._status())
+
+    async def _edit(self):
+        await asyncio.sleep(max(0, self._last + self.delay - time.monotonic()))
+        self._last = time.monotonic()
+        try:
+            await self.message.edit(embed=self._status())
+        except BaseException as e:
+            logging.warning(f'[progress] {self.channel.guild}: failed to edit status: {e}')
+
+    def update(self, done):
+        """ sets the number of members done and schedules an edit of the status message
+        """
+        self.done = done
+        if self.message is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._edit())
+
+    def add(self, name, message, success):
+        """ adds an entry to the summary
+        """
+        self.entries.append((name, message, success))
+
+    async def finish(self, fields=None):
+        """ sets the final status and sends the summary
+        """
+        if self._task is not None:
+            self._task.cancel()
+        self.fields.update(fields if fields is not None else {})
+        if self.message is not None:
+            try:
+                await self.message.edit(embed=self._status(finished=True))
+            except BaseException as e:
+                logging.warning(f'[progress] {self.channel.guild}: failed to edit status: {e}')
+
+        # paged summary
+        pages = []
+        lines = []
+        for name, message, success in self.entries:
+            line = f'{":white_check_mark:" if success else ":x:"} **{name}**: {shorten(message, 300)}'
+            if len("\n".join(lines + [line])) > EMBED_LIMITS["description"]:
+                pages.append(lines)
+                lines = []
+            lines.append(line)
+        if len(lines):
+            pages.append(lines)
+
+        embeds = []
+        for i, lines in enumerate(pages):
+            eb = Embed(title=f'{self.title}: summary', description="\n".join(lines), color=my_blue)
+            eb.set_footer(text=f'Page {i + 1}/{len(pages)}')
+            embeds.append(eb)
+        if len(embeds):
+            await send(self.channel, embeds=embeds)
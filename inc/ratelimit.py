@@ -0,0 +1,47 @@
+"""
+Copyright 2020 kivou.2000607@gmail.com
+
+This file is part of yata-bot.
+
+    yata is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    any later version.
+
+    yata is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with yata-bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# import standard modules
+import asyncio
+import collections
+import time
+
+
+class KeyRateLimiter:
+    """ sliding window rate limiter per API key
+        acquire() waits until the key has less than `calls` calls in the last `period` seconds
+    """
+
+    def __init__(self, calls=90, period=60):
+        self.calls = calls
+        self.period = period
+        self._calls = collections.defaultdict(collections.deque)
+
+    async def acquire(self, key):
+        calls = self._calls[key]
+        while True:
+            now = time.monotonic()
+            while calls and now - calls[0] > self.period:
+                calls.popleft()
+
+            if len(calls) < self.calls:
+                calls.append(now)
+                return
+
+            await asyncio.sleep(self.period - (now - calls[0]))
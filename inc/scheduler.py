@@ -0,0 +1,100 @@
+"""
+Copyright 2020 kivou.2000607@gmail.com
+
+This file is part of yata-bot.
+
+    yata is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    any later version.
+
+    yata is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with yata-bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# import standard modules
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from inc.handy import hide_key
+
+
+class DeadlineScheduler:
+    """ runs coroutines at given timestamps
+        - timers are identified by a key (a tuple starting with the name of the cog by convention)
+        - scheduling an existing key replaces its deadline
+        - a timer fires once and is then forgotten
+    """
+
+    def __init__(self):
+        self._heap = []  # (timestamp, seq, key), stale entries are skipped
+        self._timers = {}  # key: (timestamp, seq, coroutine function, args)
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._task = None
+
+    def schedule(self, key, timestamp, callback, *args):
+        seq = next(self._seq)
+        self._timers[key] = (timestamp, seq, callback, args)
+        heapq.heappush(self._heap, (timestamp, seq, key))
+        self._start()
+        self._wakeup.set()
+
+    def cancel(self, key):
+        return self._timers.pop(key, None) is not None
+
+    def cancel_all(self, prefix):
+        for key in [k for k in self._timers if k[:len(prefix)] == prefix]:
+            self._timers.pop(key)
+
+    def pending(self, prefix=()):
+        """ returns the list of (timestamp, key) of the pending timers sorted by deadline
+        """
+        return sorted([(v[0], k) for k, v in self._timers.items() if k[:len(prefix)] == prefix], key=lambda x: x[0])
+
+    def _start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    def _is_stale(self, entry):
+        timer = self._timers.get(entry[2])
+        return timer is None or timer[1] != entry[1]
+
+    async def _run(self):
+        while True:
+            # drop cancelled or rescheduled entries
+            while self._heap and self._is_stale(self._heap[0]):
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            timestamp, _, key = self._heap[0]
+            delay = timestamp - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            _, _, callback, args = self._timers.pop(key)
+            logging.debug(f'[scheduler] fire {key} ({time.time() - timestamp:.3f}s late)')
+            task = asyncio.ensure_future(callback(*args))
+            task.add_done_callback(lambda t, key=key: self._done(key, t))
+
+    def _done(self, key, task):
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f'[scheduler] timer {key}: {hide_key(task.exception())}')
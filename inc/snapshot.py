@@ -0,0 +1,60 @@
+"""
+Copyright 2020 kivou.2000607@gmail.com
+
+This file is part of yata-bot.
+
+    yata is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    any later version.
+
+    yata is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with yata-bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# import standard modules
+import hashlib
+import json
+
+
+def digest(value):
+    """ content hash of a json serializable value
+    """
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, separators=(",", ":")).encode(), digest_size=16).digest()
+
+
+class SnapshotStore:
+    """ keyed snapshots (eg: rackets by territory) with a content hash per entry
+        - update() diffs a new snapshot by hash and returns the keys added, changed and removed
+        - only the hashes of the entries are compared, values are kept for the events
+          (read the previous values in `entries` before updating)
+    """
+
+    def __init__(self, sections):
+        self.entries = {section: {} for section in sections}
+        self.hashes = {section: {} for section in sections}
+
+    def load(self, section, entries):
+        """ sets a section without computing differences (eg: from the database)
+        """
+        self.entries[section] = dict(entries)
+        self.hashes[section] = {k: digest(v) for k, v in entries.items()}
+
+    def update(self, section, entries):
+        """ replaces a section and returns the lists of keys added, changed and removed
+        """
+        hashes_p = self.hashes[section]
+        hashes = {k: digest(v) for k, v in entries.items()}
+
+        added = [k for k in hashes if k not in hashes_p]
+        changed = [k for k, h in hashes.items() if k in hashes_p and h != hashes_p[k]]
+        removed = [k for k in hashes_p if k not in hashes]
+
+        self.entries[section] = dict(entries)
+        self.hashes[section] = hashes
+        return added, changed, removed
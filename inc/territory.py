@@ -0,0 +1,190 @@
+"""
+Copyright 2020 kivou.2000607@gmail.com
+
+This file is part of yata-bot.
+
+    yata is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    any later version.
+
+    yata is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with yata-bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# import standard modules
+import asyncio
+import logging
+
+# import bot functions and classes
+from inc.yata_db import get_data
+from inc.yata_db import push_data
+from inc.handy import hide_key
+from inc.snapshot import SnapshotStore
+
+# events computed from two consecutive snapshots
+TERRITORY_EVENTS = [
+    "racket_new",  # racket appeared
+    "racket_level",  # racket changed level
+    "racket_vanished",  # racket disappeared
+    "racket_war",  # new territory war over a racket
+    "war_new",  # new territory war
+    "war_ended",  # territory war over
+    "raid_new",  # new raid
+    "raid_ended",  # raid over
+]
+
+
+class TerritoryPoller:
+    """ polls rackets, territory wars and raids with the main server master key
+        - one API call per tick shared by all the cogs
+        - the differences with the previous snapshot are dispatched as events
+          (territory, current value, previous value) to the subscribers
+        - the poller starts with the first subscription
+    """
+
+    def __init__(self, bot, period=300):
+        self.bot = bot
+        self.period = period
+        self.snapshot = None  # last response {"rackets": ..., "territorywars": ..., "raids": ..., "timestamp": ...}
+        self.store = SnapshotStore(["rackets", "territorywars", "raids"])
+        self.loaded = False
+        self._key = None
+        self._territory = None  # territory selection of the current tick (fetched on demand)
+        self._subscribers = []  # (callback, events)
+        self._task = None
+
+    def subscribe(self, callback, events):
+        """ callback(events, snapshot) is awaited each tick with the list of (event, territory, current, previous)
+            it subscribed to (not called if empty)
+        """
+        self._subscribers.append((callback, set(events)))
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(c, e) for c, e in self._subscribers if c != callback]
+        if not len(self._subscribers) and self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                logging.error(f'[territory/poller] {hide_key(e)}')
+                headers = {"error": "error on territory poller"}
+                await self.bot.send_log_main(e, headers=headers, full=True)
+            await asyncio.sleep(self.period)
+
+    async def _load(self):
+        # previous snapshot from the database (rackets and wars rows)
+        _, rackets_p = await self.bot.loop.run_in_executor(None, get_data, self.bot.bot_id, "rackets")
+        _, wars_p = await self.bot.loop.run_in_executor(None, get_data, self.bot.bot_id, "wars")
+        self.store.load("rackets", rackets_p.get("rackets", {}))
+        self.store.load("territorywars", wars_p.get("territorywars", {}))
+        self.store.load("raids", wars_p.get("raids", {}))
+        self.loaded = True
+
+    def diff(self, current):
+        """ updates the store with the current snapshot
+            return the list of events (event, territory, current value, previous value) and the sections changed
+        """
+        events = []
+        changes = []
+
+        rackets, rackets_p = current["rackets"], self.store.entries["rackets"]
+        added, changed, removed = self.store.update("rackets", rackets)
+        for k in added:
+            events.append(("racket_new", k, rackets[k], None))
+        for k in changed:
+            if rackets[k]["level"] != rackets_p[k]["level"]:
+                events.append(("racket_level", k, rackets[k], rackets_p[k]))
+        for k in removed:
+            events.append(("racket_vanished", k, None, rackets_p[k]))
+        if len(added + changed + removed):
+            changes.append("rackets")
+
+        wars, wars_p = current["territorywars"], self.store.entries["territorywars"]
+        added, changed, removed = self.store.update("territorywars", wars)
+        for k in added:
+            events.append(("war_new", k, wars[k], None))
+            if k in rackets:
+                events.append(("racket_war", k, wars[k], None))
+        for k in removed:
+            events.append(("war_ended", k, None, wars_p[k]))
+        if len(added + changed + removed):
+            changes.append("territorywars")
+
+        raids, raids_p = current["raids"], self.store.entries["raids"]
+        added, changed, removed = self.store.update("raids", raids)
+        for k in added:
+            events.append(("raid_new", k, raids[k], None))
+        for k in removed:
+            events.append(("raid_ended", k, None, raids_p[k]))
+        if len(added + changed + removed):
+            changes.append("raids")
+
+        return events, changes
+
+    async def get_territory(self):
+        """ territory selection fetched at most once per tick
+            return {} on error
+        """
+        if self._territory is None:
+            response, e = await self.bot.api_call("torn", "", ["territory"], self._key, check_key=["territory"])
+            if e:
+                logging.error(f'[territory/poller] API error {response["error"]["error"]}')
+                return {}
+            self._territory = response["territory"]
+        return self._territory
+
+    async def tick(self):
+        logging.debug("[territory/poller] start tick")
+
+        guild = self.bot.get_guild(self.bot.main_server_id)
+        _, _, key = await self.bot.get_master_key(guild)
+        if key is None:
+            logging.error(f"[territory/poller] Error no key found for on main server id {self.bot.main_server_id}")
+            return
+
+        response, e = await self.bot.api_call("torn", "", ["rackets", "territorywars", "raids", "timestamp"], key, check_key=["rackets", "territorywars", "raids"])
+        if e:
+            logging.error(f'[territory/poller] API error {response["error"]["error"]}')
+            return
+
+        self._key = key
+        self._territory = None
+
+        if not self.loaded:
+            await self._load()
+        events, changes = self.diff(response)
+        self.snapshot = response
+        logging.debug(f"[territory/poller] {len(events)} events, sections changed: {changes}")
+
+        # persist the sections that changed only
+        timestamp = int(response["timestamp"])
+        if "rackets" in changes:
+            await push_data(self.bot.bot_id, timestamp, {"rackets": response["rackets"], "timestamp": timestamp}, "rackets")
+        if "territorywars" in changes or "raids" in changes:
+            await push_data(self.bot.bot_id, timestamp, {"territorywars": response["territorywars"], "raids": response["raids"], "timestamp": timestamp}, "wars")
+
+        # dispatch the events
+        for callback, subscribed in list(self._subscribers):
+            events_cb = [event for event in events if event[0] in subscribed]
+            if not len(events_cb):
+                continue
+            try:
+                await callback(events_cb, response)
+            except BaseException as e:
+                logging.error(f'[territory/poller] {callback.__qualname__}: {hide_key(e)}')
+                headers = {"error": f"error on territory events ({callback.__qualname__})"}
+                await self.bot.send_log_main(e, headers=headers, full=True)
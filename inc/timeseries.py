@@ -0,0 +1,95 @@
+"""
+Copyright 2020 kivou.2000607@gmail.com
+
+This file is part of yata-bot.
+
+    yata is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    any later version.
+
+    yata is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with yata-bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# import standard modules
+import numpy as np
+
+
+class RingBuffer:
+    """ fixed size time series
+        - one row per record, one column per series (eg: one column per stock)
+        - several fields share the same rows (eg: price, shares, ...)
+        - missing values are stored as nan
+        - the oldest rows are overwritten once the buffer is full
+    """
+
+    def __init__(self, size, fields):
+        self.size = size
+        self.fields = list(fields)
+        self.columns = []  # series id of each column
+        self._column = {}  # series id: column index
+        self._timestamps = np.zeros(size)
+        self._data = {f: np.full((size, 0), np.nan) for f in self.fields}
+        self._n = 0  # number of rows recorded since the start
+
+    def __len__(self):
+        return min(self._n, self.size)
+
+    def _add_column(self, series):
+        self._column[series] = len(self.columns)
+        self.columns.append(series)
+        for f in self.fields:
+            self._data[f] = np.hstack((self._data[f], np.full((self.size, 1), np.nan)))
+
+    def append(self, timestamp, values):
+        """ records one row
+            values: {series id: {field: value}}
+        """
+        for series in values:
+            if series not in self._column:
+                self._add_column(series)
+
+        row = self._n % self.size
+        self._timestamps[row] = timestamp
+        for f in self.fields:
+            self._data[f][row, :] = np.nan
+        for series, v in values.items():
+            c = self._column[series]
+            for f in self.fields:
+                if v.get(f) is not None:
+                    self._data[f][row, c] = v[f]
+        self._n += 1
+
+    def _order(self):
+        # row indices from the oldest to the newest
+        n = len(self)
+        return (np.arange(n) + self._n - n) % self.size
+
+    def timestamps(self):
+        return self._timestamps[self._order()]
+
+    def view(self, field):
+        """ chronological (rows, columns) array of a field
+        """
+        return self._data[field][self._order()]
+
+    def rolling_mean(self, field, window, min_periods=1):
+        """ rolling mean over the last `window` rows of each column ignoring nan
+            rows with less than `min_periods` values are nan
+        """
+        data = self.view(field)
+        valid = ~np.isnan(data)
+        sums = np.cumsum(np.where(valid, data, 0.0), axis=0)
+        counts = np.cumsum(valid, axis=0)
+        sums[window:] = sums[window:] - sums[:-window]
+        counts[window:] = counts[window:] - counts[:-window]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sums / counts
+        mean[counts < max(min_periods, 1)] = np.nan
+        return mean
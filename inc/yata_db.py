@@ -206,11 +206,11 @@ async def push_data(bot_id, timestamp, data, module):
     del db_cred["dbname"]
     con = await asyncpg.connect(database=dbname, **db_cred)
     if module == "rackets":
-        await con.execute('UPDATE bot_rackets SET timestamp = $1, rackets = $2 WHERE id = $3', timestamp, json.dumps(data), bot_id)
+        await con.execute('UPDATE bot_rackets SET timestamp = $1, rackets = $2 WHERE id = $3', timestamp, json.dumps(data, separators=(",", ":")), bot_id)
     elif module == "stocks":
-        await con.execute('UPDATE bot_stocks SET timestamp = $1, rackets = $2 WHERE id = $3', timestamp, json.dumps(data), bot_id)
+        await con.execute('UPDATE bot_stocks SET timestamp = $1, rackets = $2 WHERE id = $3', timestamp, json.dumps(data, separators=(",", ":")), bot_id)
     elif module == "wars":
-        await con.execute('UPDATE bot_wars SET timestamp = $1, wars = $2 WHERE id = $3', timestamp, json.dumps(data), bot_id)
+        await con.execute('UPDATE bot_wars SET timestamp = $1, wars = $2 WHERE id = $3', timestamp, json.dumps(data, separators=(",", ":")), bot_id)
     await con.close()
 
 
@@ -279,6 +279,116 @@ async def get_scheduled():
     return loots
 
 
+async def get_loot_timeline():
+    # get YATA npcs loot timings and scheduled attacks joined with their NPC in one connection
+    db_cred = get_credentials()
+    dbname = db_cred["dbname"]
+    del db_cred["dbname"]
+    con = await asyncpg.connect(database=dbname, **db_cred)
+    loots = await con.fetch(f'SELECT * FROM loot_NPC WHERE show = true;')
+    scheduled = await con.fetch(f'SELECT s.*, n."name" AS npc_name, n."tId" AS npc_tid FROM loot_scheduledAttack s JOIN loot_NPC n ON n."id" = s."npc_id";')
+    await con.close()
+
+    return loots, scheduled
+
+
+async def get_identities():
+    # get the discord <-> torn identities confirmed by the bot (creates the table if needed)
+    db_cred = get_credentials()
+    dbname = db_cred["dbname"]
+    del db_cred["dbname"]
+    con = await asyncpg.connect(database=dbname, **db_cred)
+    await con.execute('CREATE TABLE IF NOT EXISTS bot_identity (discord_id bigint PRIMARY KEY, torn_id integer NOT NULL, confirmed integer NOT NULL);')
+    identities = await con.fetch('SELECT discord_id, torn_id, confirmed FROM bot_identity;')
+    await con.close()
+
+    return identities
+
+
+async def set_identity(discord_id, torn_id, confirmed):
+    db_cred = get_credentials()
+    dbname = db_cred["dbname"]
+    del db_cred["dbname"]
+    con = await asyncpg.connect(database=dbname, **db_cred)
+    await con.execute('''
+        INSERT INTO bot_identity(discord_id, torn_id, confirmed) VALUES($1, $2, $3)
+        ON CONFLICT (discord_id) DO UPDATE SET torn_id = EXCLUDED.torn_id, confirmed = EXCLUDED.confirmed
+        ''', discord_id, torn_id, confirmed)
+    await con.close()
+
+
+async def delete_identity(discord_id):
+    db_cred = get_credentials()
+    dbname = db_cred["dbname"]
+    del db_cred["dbname"]
+    con = await asyncpg.connect(database=dbname, **db_cred)
+    await con.execute('DELETE FROM bot_identity WHERE discord_id = $1', discord_id)
+    await con.close()
+
+
+async def get_verify_states(guild_id):
+    # get the verification state of the members of a guild (creates the table if needed)
+    db_cred = get_credentials()
+    dbname = db_cred["dbname"]
+    del db_cred["dbname"]
+    con = await asyncpg.connect(database=dbname, **db_cred)
+    await con.execute('''
+        CREATE TABLE IF NOT EXISTS bot_verify_state (
+            guild_id bigint NOT NULL, discord_id bigint NOT NULL, torn_id integer NOT NULL, faction_id integer NOT NULL,
+            position text, nickname text, roles_hash text NOT NULL, verified_at integer NOT NULL,
+            PRIMARY KEY (guild_id, discord_id));
+        ''')
+    states = await con.fetch('SELECT * FROM bot_verify_state WHERE guild_id = $1;', guild_id)
+    await con.close()
+
+    return states
+
+
+async def set_verify_states(states):
+    # states: list of (guild_id, discord_id, torn_id, faction_id, position, nickname, roles_hash, verified_at)
+    db_cred = get_credentials()
+    dbname = db_cred["dbname"]
+    del db_cred["dbname"]
+    con = await asyncpg.connect(database=dbname, **db_cred)
+    await con.executemany('''
+        INSERT INTO bot_verify_state(guild_id, discord_id, torn_id, faction_id, position, nickname, roles_hash, verified_at) VALUES($1, $2, $3, $4, $5, $6, $7, $8)
+        ON CONFLICT (guild_id, discord_id) DO UPDATE SET torn_id = EXCLUDED.torn_id, faction_id = EXCLUDED.faction_id, position = EXCLUDED.position,
+        nickname = EXCLUDED.nickname, roles_hash = EXCLUDED.roles_hash, verified_at = EXCLUDED.verified_at
+        ''', states)
+    await con.close()
+
+
+async def get_verify_jobs(bot_id):
+    # get the verification jobs running or paused (creates the table if needed)
+    db_cred = get_credentials()
+    dbname = db_cred["dbname"]
+    del db_cred["dbname"]
+    con = await asyncpg.connect(database=dbname, **db_cred)
+    await con.execute('''
+        CREATE TABLE IF NOT EXISTS bot_verify_job (
+            bot_id integer NOT NULL, guild_id bigint NOT NULL, type text NOT NULL, status text NOT NULL, cursor text NOT NULL,
+            options text NOT NULL, channel_id bigint NOT NULL, started integer NOT NULL, updated integer NOT NULL,
+            PRIMARY KEY (bot_id, guild_id, type));
+        ''')
+    jobs = await con.fetch("SELECT * FROM bot_verify_job WHERE bot_id = $1 AND status IN ('running', 'paused');", bot_id)
+    await con.close()
+
+    return jobs
+
+
+async def set_verify_job(bot_id, guild_id, type, status, cursor, options, channel_id, started, updated):
+    db_cred = get_credentials()
+    dbname = db_cred["dbname"]
+    del db_cred["dbname"]
+    con = await asyncpg.connect(database=dbname, **db_cred)
+    await con.execute('''
+        INSERT INTO bot_verify_job(bot_id, guild_id, type, status, cursor, options, channel_id, started, updated) VALUES($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ON CONFLICT (bot_id, guild_id, type) DO UPDATE SET status = EXCLUDED.status, cursor = EXCLUDED.cursor, options = EXCLUDED.options,
+        channel_id = EXCLUDED.channel_id, started = EXCLUDED.started, updated = EXCLUDED.updated
+        ''', bot_id, guild_id, type, status, cursor, options, channel_id, started, updated)
+    await con.close()
+
+
 async def get_npc(id):
     # get YATA npcs loot timings
     db_cred = get_credentials()
@@ -75,6 +75,8 @@ bot_id = config("BOT_ID", default=1)
 github_token = config("GITHUB_TOKEN", default="")
 main_server_id = config("MAIN_SERVER_ID", default=581227228537421825)
 master_key = config("MASTER_KEY", default="")
+stocks_snapshot_ttl = config("STOCKS_SNAPSHOT_TTL", default=60, cast=int)
+identity_max_age = config("IDENTITY_MAX_AGE", default=30 * 24 * 3600, cast=int)
 logging.info(f'Starting bot: bot id = {bot_id}')
 
 # sentry
@@ -108,6 +110,8 @@ bot = YataBot(configurations=configurations,
               main_server_id=main_server_id,
               github_token=github_token,
               master_key=master_key,
+              stocks_snapshot_ttl=stocks_snapshot_ttl,
+              identity_max_age=identity_max_age,
               intents=intents)
 bot.remove_command('help')
 